@@ -1,15 +1,18 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import os
 from dotenv import load_dotenv
 
 from . import models, schemas
-from .database import get_db
+from .database import AsyncSessionLocal
+from .hashing import password_hasher, pwd_context
+from .user_cache import CachedUser, user_cache
 
 load_dotenv()
 
@@ -17,7 +20,6 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login", auto_error=False)
 
 
@@ -49,27 +51,42 @@ def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
+async def find_user(db: AsyncSession, *criteria) -> Optional[models.User]:
+    result = await db.execute(select(models.User).where(*criteria))
+    return result.scalar_one_or_none()
+
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await find_user(db, models.User.email == email)
     if not user:
         return False
     if not user.hashed_password:  # OAuth user has no password
         return False
-    if not verify_password(password, user.hashed_password):
+    # Give the connection back to the pool while bcrypt runs
+    await db.close()
+    verified, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not verified:
         return False
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made
+        db.add(user)
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    # Give the connection back to the pool while bcrypt runs
+    await db.close()
+    hashed_password = await password_hasher.hash(user.password)
     db_user = models.User(
         email=user.email,
         username=user.username,
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
@@ -87,10 +104,28 @@ def create_oauth_user(db: Session, email: str, username: str, oauth_provider: st
     return db_user
 
 
-async def get_current_user(
-    token: Optional[str] = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
+async def load_user(token_data: schemas.TokenData) -> Optional[CachedUser]:
+    if token_data.user_id is not None:
+        cached = user_cache.get(token_data.user_id)
+        if cached is not None:
+            return cached
+    
+    generation = user_cache.generation
+    async with AsyncSessionLocal() as db:
+        if token_data.user_id is not None:
+            user = await db.get(models.User, token_data.user_id)
+        else:
+            # Tokens issued before the uid claim was added
+            user = await find_user(db, models.User.email == token_data.email)
+        if user is None:
+            return None
+        cached = CachedUser.from_model(user)
+    
+    user_cache.set(cached, generation)
+    return cached
+
+
+async def get_current_user(token: Optional[str] = Depends(oauth2_scheme)) -> Optional[CachedUser]:
     if not token:
         return None
     
@@ -105,20 +140,21 @@ async def get_current_user(
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = schemas.TokenData(email=email)
+        token_data = schemas.TokenData(email=email, user_id=payload.get("uid"))
     except JWTError:
         raise credentials_exception
     
-    user = get_user_by_email(db, email=token_data.email)
-    if user is None:
+    user = await load_user(token_data)
+    # A token stays bound to the email it was issued for
+    if user is None or user.email != token_data.email:
         raise credentials_exception
     
     return user
 
 
 async def get_current_active_user(
-    current_user: models.User = Depends(get_current_user)
-):
+    current_user: CachedUser = Depends(get_current_user)
+) -> CachedUser:
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,21 +1,107 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 import os
 from dotenv import load_dotenv
 
+from .pool_monitor import InstrumentedAsyncQueuePool, InstrumentedQueuePool, monitor_engine
+from . import metrics, sqlite_profile
+from .profiling import request_profiler
+from .slow_query import slow_query_log
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set!")
 
+# Applied to the sync and the async engine separately
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+
+def pool_options(url: str, name: str, poolclass) -> dict:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection; keep SQLAlchemy's pool for it
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_logging_name": name,
+    }
+
+
 # SQLite requires check_same_thread=False for FastAPI
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
+    **pool_options(DATABASE_URL, "sync", InstrumentedQueuePool)
+)
+sync_pool_monitor = monitor_engine("sync", engine)
+
+IS_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+SQLITE_PROFILE = IS_SQLITE and sqlite_profile.SQLITE_PROFILE
+SERIALIZE_WRITES = SQLITE_PROFILE and sqlite_profile.SQLITE_SERIALIZE_WRITES
+
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    class_=sqlite_profile.WriterSession if SERIALIZE_WRITES else Session
+)
+
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_url(url: str):
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername))
+
+
+# Used by the async route handlers so DB round trips do not block the event loop.
+# expire_on_commit=False: attributes must stay readable after commit without
+# an implicit (and in async, impossible) lazy refresh.
+async_engine = create_async_engine(
+    get_async_url(DATABASE_URL),
+    **pool_options(DATABASE_URL, "async", InstrumentedAsyncQueuePool)
+)
+async_pool_monitor = monitor_engine("async", async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    expire_on_commit=False,
+    autoflush=False,
+    class_=sqlite_profile.GatedAsyncSession if SERIALIZE_WRITES else AsyncSession
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Per-request statement counts and DB time for app.metrics
+metrics.instrument_engine(engine)
+metrics.instrument_engine(async_engine.sync_engine)
+# Slow statements of both engines; plans are captured on the sync engine
+slow_query_log.attach(engine, engine)
+slow_query_log.attach(async_engine.sync_engine, engine)
+# SQL timings of requests selected by app.profiling
+request_profiler.attach(engine)
+request_profiler.attach(async_engine.sync_engine)
+
+if SQLITE_PROFILE:
+    event.listen(engine, "connect", sqlite_profile.set_pragmas)
+    event.listen(async_engine.sync_engine, "connect", sqlite_profile.set_pragmas)
 
 Base = declarative_base()
 
@@ -26,5 +112,12 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
+    from .migrations import run_migrations
+
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
@@ -0,0 +1,112 @@
+import json
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+from bs4 import BeautifulSoup
+
+# Raw price text plus a currency code if the source states one explicitly
+PriceMatch = Tuple[str, Optional[str]]
+
+
+class PriceExtractor(NamedTuple):
+    """Reads the price from the first element matching a CSS selector."""
+    selector: str
+    currency: Optional[str] = None
+
+    def extract(self, soup: BeautifulSoup) -> Optional[PriceMatch]:
+        element = soup.select_one(self.selector)
+        if element is None:
+            return None
+        return element.get_text(), self.currency
+
+
+AMAZON = PriceExtractor("span.a-price-whole", currency="USD")
+
+# Keyed by host without "www."; subdomains of a key match too, so
+# "m.market.yandex.ru" finds "market.yandex.ru"
+EXTRACTORS: Dict[str, PriceExtractor] = {
+    "ozon.ru": PriceExtractor('span[class*="price" i]'),
+    "wildberries.ru": PriceExtractor("span.price-block__final-price"),
+    "market.yandex.ru": PriceExtractor('span[data-auto="snippet-price-current"]'),
+}
+
+# Stores with a site under many public suffixes, keyed by their
+# second-level label: amazon.nl, amazon.co.uk, amazon.com.mx, ...
+STORE_LABELS: Dict[str, PriceExtractor] = {
+    "amazon": AMAZON,
+}
+
+
+def _store_label(labels: List[str]) -> Optional[str]:
+    # "co" and "com" under a country code make a two-label suffix
+    if len(labels) >= 3 and labels[-2] in ("co", "com"):
+        return labels[-3]
+    if len(labels) >= 2:
+        return labels[-2]
+    return None
+
+
+def find_extractor(url: str) -> Optional[PriceExtractor]:
+    host = (urlsplit(url).hostname or "").lower()
+    labels = host.split(".")
+    for start in range(len(labels) - 1):
+        extractor = EXTRACTORS.get(".".join(labels[start:]))
+        if extractor:
+            return extractor
+    return STORE_LABELS.get(_store_label(labels))
+
+
+def _as_list(value: Any) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _has_type(node: dict, name: str) -> bool:
+    # "@type" may be a list and may carry the full "https://schema.org/..." IRI
+    return any(
+        isinstance(value, str) and value.rsplit("/", 1)[-1] == name
+        for value in _as_list(node.get("@type"))
+    )
+
+
+def _json_ld_nodes(data: Any) -> Iterator[dict]:
+    for node in _as_list(data):
+        if not isinstance(node, dict):
+            continue
+        yield node
+        yield from _json_ld_nodes(node.get("@graph"))
+
+
+def _offer_price(offer: dict) -> Optional[PriceMatch]:
+    price = offer.get("price")
+    if price in (None, ""):
+        price = offer.get("lowPrice")
+    currency = offer.get("priceCurrency")
+    if price in (None, ""):
+        for spec in _as_list(offer.get("priceSpecification")):
+            if isinstance(spec, dict) and spec.get("price") not in (None, ""):
+                price = spec["price"]
+                currency = currency or spec.get("priceCurrency")
+                break
+    if price in (None, ""):
+        return None
+    return str(price), currency if isinstance(currency, str) else None
+
+
+def extract_json_ld_price(soup: BeautifulSoup) -> Optional[PriceMatch]:
+    """Price of the first schema.org Product with an Offer or AggregateOffer."""
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+        for node in _json_ld_nodes(data):
+            if not _has_type(node, "Product"):
+                continue
+            for offer in _as_list(node.get("offers")):
+                if isinstance(offer, dict):
+                    match = _offer_price(offer)
+                    if match:
+                        return match
+    return None
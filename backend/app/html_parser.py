@@ -0,0 +1,27 @@
+import importlib.util
+import os
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+# "auto" picks lxml when it is installed and falls back to the stdlib html.parser.
+# Any bs4 tree builder name ("lxml", "html.parser", "html5lib") can be forced.
+HTML_PARSER = os.getenv("HTML_PARSER", "auto")
+
+FAST_PARSERS = ("lxml",)
+
+
+def resolve_parser(name: str = HTML_PARSER) -> str:
+    if name != "auto":
+        return name
+    for parser in FAST_PARSERS:
+        if importlib.util.find_spec(parser) is not None:
+            return parser
+    return "html.parser"
+
+
+PARSER = resolve_parser()
+
+
+def make_soup(html: str, parser: Optional[str] = None) -> BeautifulSoup:
+    return BeautifulSoup(html, parser or PARSER)
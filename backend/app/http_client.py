@@ -0,0 +1,182 @@
+import asyncio
+import contextlib
+import importlib.util
+import logging
+import os
+import re
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() in ("1", "true", "yes")
+# Concurrent fetches per host; HTTP_HOST_LIMITS overrides it per host,
+# e.g. "www.ozon.ru=2,www.wildberries.ru=3"
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "4"))
+HTTP_HOST_LIMITS = os.getenv("HTTP_HOST_LIMITS", "")
+
+# Any case, optional whitespace before ">"; bounded so a match split across
+# two chunks is still found by rescanning the last HEAD_END_OVERLAP bytes
+HEAD_END = re.compile(rb"</head\s{0,32}>", re.IGNORECASE)
+HEAD_END_OVERLAP = len(b"</head") + 32
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+
+def parse_host_limits(value: str) -> Dict[str, int]:
+    limits = {}
+    for pair in filter(None, (p.strip() for p in value.split(","))):
+        host, _, limit = pair.partition("=")
+        limits[host.strip().lower()] = int(limit)
+    return limits
+
+
+class _HostSlot:
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+        self.in_flight = 0
+
+
+class HTTPClientPool:
+    """Application-lifetime httpx client with keep-alive pooling and per-host limits.
+
+    start()/close() are called on app startup/shutdown; a transport can be
+    injected to serve requests without the network.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        timeout: float = HTTP_TIMEOUT,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        http2: bool = HTTP2_ENABLED,
+        per_host_limit: int = HTTP_PER_HOST_LIMIT,
+        host_limits: Optional[Dict[str, int]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP2_ENABLED is set but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.per_host_limit = per_host_limit
+        self.host_limits = host_limits if host_limits is not None else parse_host_limits(HTTP_HOST_LIMITS)
+        self.transport = transport
+        self.requests = 0
+        self.errors = 0
+        self.waiting = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._hosts: Dict[str, _HostSlot] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+                follow_redirects=True,
+                headers={"User-Agent": USER_AGENT},
+                transport=self.transport,
+            )
+        return self._client
+
+    async def start(self):
+        self.client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @contextlib.asynccontextmanager
+    async def host_slot(self, url: str):
+        host = (urlsplit(url).hostname or "").lower()
+        slot = self._hosts.get(host)
+        if slot is None:
+            slot = self._hosts[host] = _HostSlot(self.host_limits.get(host, self.per_host_limit))
+        slot.users += 1
+        try:
+            self.waiting += 1
+            try:
+                await slot.semaphore.acquire()
+            finally:
+                self.waiting -= 1
+            slot.in_flight += 1
+            try:
+                yield
+            finally:
+                slot.in_flight -= 1
+                slot.semaphore.release()
+        finally:
+            slot.users -= 1
+            if slot.users == 0:
+                del self._hosts[host]
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        async with self.host_slot(url):
+            self.requests += 1
+            try:
+                return await self.client.get(url, **kwargs)
+            except httpx.HTTPError:
+                self.errors += 1
+                raise
+
+    async def get_prefix(self, url: str, head_budget: int, max_bytes: int) -> Tuple[httpx.Response, str]:
+        """Stream a page and stop reading once </head> plus head_budget bytes,
+        or max_bytes in total, have arrived. Returns the response and the decoded prefix.
+        """
+        async with self.host_slot(url):
+            self.requests += 1
+            try:
+                async with self.client.stream("GET", url) as response:
+                    if response.status_code != 200:
+                        return response, ""
+                    body = bytearray()
+                    limit = max_bytes
+                    async for chunk in response.aiter_bytes():
+                        scan_from = max(0, len(body) - HEAD_END_OVERLAP)
+                        body += chunk
+                        if limit == max_bytes:
+                            head_end = HEAD_END.search(body, scan_from)
+                            if head_end is not None:
+                                limit = min(max_bytes, head_end.end() + head_budget)
+                        if len(body) >= limit:
+                            break
+                    encoding = response.encoding or "utf-8"
+                    return response, bytes(body[:limit]).decode(encoding, errors="replace")
+            except httpx.HTTPError:
+                self.errors += 1
+                raise
+
+    def stats(self) -> dict:
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", [])
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "open_connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "requests": self.requests,
+            "errors": self.errors,
+            "waiting": self.waiting,
+            "in_flight_by_host": {host: slot.in_flight for host, slot in self._hosts.items() if slot.in_flight},
+        }
+
+
+http_client_pool = HTTPClientPool()
@@ -1,10 +1,24 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Header, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
+import hmac
 import os
+from typing import Optional
 from dotenv import load_dotenv
 
-from .database import init_db
+from .database import SERIALIZE_WRITES, async_engine, async_pool_monitor, init_db, sync_pool_monitor
+from .hashing import password_hasher
+from .metrics import MetricsMiddleware, register_websocket_metrics, registry
+from .http_client import http_client_pool
+from .pool_monitor import RouteContextMiddleware
+from .profiling import ProfilingMiddleware, request_profiler
+from .public_cache import public_wishlist_cache
+from .realtime import bus, create_backend, manager
+from .slow_query import slow_query_log
+from .sqlite_profile import writer_gate
+from .url_cache import url_metadata_cache
+from .user_cache import user_cache
 from .routes import auth, wishlists, items, url_parser
 
 load_dotenv()
@@ -28,8 +42,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Next-page cursor of GET /api/wishlists
+    expose_headers=["X-Next-Cursor"],
 )
 
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RouteContextMiddleware)
+register_websocket_metrics(manager)
+
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
@@ -42,6 +63,27 @@ except RuntimeError:
 def on_startup():
     init_db()
 
+@app.on_event("startup")
+async def start_event_bus():
+    await bus.start(create_backend())
+
+@app.on_event("shutdown")
+async def stop_event_bus():
+    await bus.stop()
+
+@app.on_event("startup")
+async def start_http_client():
+    await http_client_pool.start()
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client_pool.close()
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    # aiosqlite runs each connection on a non-daemon thread that would keep the process alive
+    await async_engine.dispose()
+
 app.include_router(auth.router)
 app.include_router(wishlists.router)
 app.include_router(items.router)
@@ -59,3 +101,50 @@ def root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+# /stats and /metrics expose SQL, routes, file paths and per-wishlist
+# activity: they answer only requests carrying STATS_TOKEN, in X-Stats-Token
+# or as a bearer token (what Prometheus scrape configs send), and are hidden
+# (404) while it is unset
+STATS_TOKEN = os.getenv("STATS_TOKEN", "")
+
+def require_stats_token(x_stats_token: Optional[str] = Header(None),
+                        authorization: Optional[str] = Header(None)):
+    token = x_stats_token
+    if token is None and authorization is not None:
+        scheme, _, credentials = authorization.partition(" ")
+        if scheme.lower() == "bearer":
+            token = credentials.strip()
+    if not STATS_TOKEN or token is None or not hmac.compare_digest(token.encode(), STATS_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+# async: rendered on the event loop thread, where the metrics are recorded
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_stats_token)],
+         include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats", dependencies=[Depends(require_stats_token)], include_in_schema=False)
+def stats():
+    result = {
+        "public_wishlist_cache": public_wishlist_cache.stats(),
+        "websockets": manager.stats(),
+        "url_metadata_cache": url_metadata_cache.stats(),
+        "http_client": http_client_pool.stats(),
+        "user_cache": user_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+        "db_pool": {
+            "sync": sync_pool_monitor.stats(),
+            "async": async_pool_monitor.stats()
+        }
+    }
+    if request_profiler.enabled:
+        result["profiling"] = request_profiler.stats()
+    if slow_query_log.enabled:
+        result["slow_queries"] = slow_query_log.stats()
+    if SERIALIZE_WRITES:
+        result["sqlite_writer"] = writer_gate.stats()
+    return result
+
+# After every route is declared: profiles the endpoint of selected requests
+request_profiler.wrap_routes(app.routes)
@@ -0,0 +1,239 @@
+import bisect
+import contextvars
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .pool_monitor import route_of
+
+logger = logging.getLogger(__name__)
+
+# Requests over either budget are logged with their query count and DB time; 0 = off
+REQUEST_QUERY_BUDGET = int(os.getenv("REQUEST_QUERY_BUDGET", "0"))
+REQUEST_LATENCY_BUDGET_MS = float(os.getenv("REQUEST_LATENCY_BUDGET_MS", "0"))
+# Per-wishlist WebSocket gauges are exported for the busiest lists only
+METRICS_WS_TOP_WISHLISTS = int(os.getenv("METRICS_WS_TOP_WISHLISTS", "20"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# Observations happen on the event loop thread (the middleware and
+# url_parser), so the metric types below need no locking.
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self.values: Dict[Labels, List[float]] = {}
+
+    def observe(self, labels: Labels, value: float):
+        counts = self.values.get(labels)
+        if counts is None:
+            counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self) -> Iterator[str]:
+        for labels, counts in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="%s"' % ("+Inf" if bound == float("inf") else _format_value(bound))
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(counts[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+class Collected:
+    """Values read from elsewhere at scrape time."""
+
+    def __init__(self, name: str, help: str, kind: str, labels: Tuple[str, ...],
+                 collect: Callable[[], Iterable[Tuple[Labels, float]]]):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = labels
+        self.collect = collect
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.collect():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+ROUTE_LABELS = ("method", "route")
+requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status", ROUTE_LABELS + ("status",)
+))
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ROUTE_LABELS
+))
+request_queries = registry.register(Histogram(
+    "http_request_db_queries", "SQL statements per HTTP request", ROUTE_LABELS, QUERY_BUCKETS
+))
+request_db_time = registry.register(Counter(
+    "http_request_db_seconds_total", "Time spent executing SQL by route template", ROUTE_LABELS
+))
+url_fetch_duration = registry.register(Histogram(
+    "url_fetch_duration_seconds", "Outbound page fetches of /api/url/parse by outcome", ("outcome",)
+))
+
+
+class _RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# Shared with the threadpool (sync endpoints) and SQLAlchemy's greenlets
+# (async sessions), which both run with a copy of the request's context
+_request_stats: contextvars.ContextVar[Optional[_RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _request_stats.get() is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    started = getattr(context, "_metrics_started", None)
+    if stats is None or started is None:
+        return
+    stats.queries += 1
+    stats.db_time += time.perf_counter() - started
+
+
+def instrument_engine(engine: Engine):
+    """Count statements and DB time of the current request on this engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """Records latency, status and SQL cost of every HTTP request by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = _RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stats.reset(token)
+            labels = route_of(scope)
+            requests_total.inc(labels + (str(status_code),))
+            request_duration.observe(labels, elapsed)
+            request_queries.observe(labels, stats.queries)
+            request_db_time.inc(labels, stats.db_time)
+            if (REQUEST_QUERY_BUDGET and stats.queries > REQUEST_QUERY_BUDGET) or (
+                REQUEST_LATENCY_BUDGET_MS and elapsed * 1000 > REQUEST_LATENCY_BUDGET_MS
+            ):
+                logger.warning(
+                    "%s %s over budget: %.1f ms, %d queries, %.1f ms in the database (status %d)",
+                    *labels, elapsed * 1000, stats.queries, stats.db_time * 1000, status_code
+                )
+
+
+def register_websocket_metrics(manager):
+    def connections_by_wishlist():
+        busiest = sorted(manager.active_connections.items(), key=lambda entry: len(entry[1]), reverse=True)
+        for wishlist_id, connections in busiest[:METRICS_WS_TOP_WISHLISTS]:
+            yield (str(wishlist_id),), len(connections)
+
+    registry.register(Collected(
+        "websocket_wishlist_connections", "Open WebSocket connections per wishlist (busiest lists only)",
+        "gauge", ("wishlist_id",), connections_by_wishlist,
+    ))
+    registry.register(Collected(
+        "websocket_connections", "Open WebSocket connections in this worker", "gauge", (),
+        lambda: [((), manager.stats()["connections"])],
+    ))
+    registry.register(Collected(
+        "websocket_dropped_messages_total", "Messages dropped for slow WebSocket consumers", "counter", (),
+        lambda: [((), manager.dropped_messages)],
+    ))
+    registry.register(Collected(
+        "websocket_evicted_connections_total", "WebSocket connections closed as too slow or failed", "counter", (),
+        lambda: [((), manager.evicted_connections)],
+    ))
@@ -0,0 +1,50 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+
+def add_contribution_totals(engine: Engine):
+    """Add the stored contribution totals to wishlist_items and backfill them."""
+    columns = {c["name"] for c in inspect(engine).get_columns("wishlist_items")}
+    if "total_contributed" in columns and "contributors_count" in columns:
+        return
+
+    with engine.begin() as conn:
+        if "total_contributed" not in columns:
+            conn.execute(text(
+                "ALTER TABLE wishlist_items "
+                "ADD COLUMN total_contributed NUMERIC(10, 2) NOT NULL DEFAULT 0"
+            ))
+        if "contributors_count" not in columns:
+            conn.execute(text(
+                "ALTER TABLE wishlist_items "
+                "ADD COLUMN contributors_count INTEGER NOT NULL DEFAULT 0"
+            ))
+        conn.execute(text(
+            "UPDATE wishlist_items SET "
+            "total_contributed = COALESCE((SELECT SUM(c.amount) FROM contributions c "
+            "WHERE c.item_id = wishlist_items.id), 0), "
+            "contributors_count = (SELECT COUNT(*) FROM contributions c "
+            "WHERE c.item_id = wishlist_items.id)"
+        ))
+
+
+def add_listing_indexes(engine: Engine):
+    """Create the indexes behind the paginated wishlist listing on existing tables."""
+    from .models import Wishlist, WishlistItem
+
+    for table in (Wishlist.__table__, WishlistItem.__table__):
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+MIGRATIONS = [
+    add_contribution_totals,
+    add_listing_indexes,
+]
+
+
+def run_migrations(engine: Engine):
+    # create_all() does not alter existing tables, so schema changes to
+    # existing tables are applied here. Every migration must be idempotent.
+    for migration in MIGRATIONS:
+        migration(engine)
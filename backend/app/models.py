@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Numeric
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, Text, Numeric
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -23,6 +23,10 @@ class User(Base):
 
 class Wishlist(Base):
     __tablename__ = "wishlists"
+    __table_args__ = (
+        # Keyset pagination of an owner's lists, newest first
+        Index("ix_wishlists_owner_created", "owner_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -44,6 +48,9 @@ class Wishlist(Base):
 
 class WishlistItem(Base):
     __tablename__ = "wishlist_items"
+    __table_args__ = (
+        Index("ix_wishlist_items_wishlist_id", "wishlist_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -55,6 +62,9 @@ class WishlistItem(Base):
     priority = Column(Integer, default=0)  # 0=low, 1=medium, 2=high
     is_reserved = Column(Boolean, default=False)
     is_pooling = Column(Boolean, default=False)  # allows group contributions
+    # Running totals of contributions, maintained by contribute_to_item
+    total_contributed = Column(Numeric(10, 2), nullable=False, default=0, server_default="0")
+    contributors_count = Column(Integer, nullable=False, default=0, server_default="0")
     wishlist_id = Column(Integer, ForeignKey("wishlists.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
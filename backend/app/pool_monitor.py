@@ -0,0 +1,170 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Connections checked out for longer than this are logged with the route
+DB_HOLD_WARN_SECONDS = float(os.getenv("DB_HOLD_WARN_SECONDS", "1.0"))
+
+# ASGI scope of the request being handled; the router adds "route" to it
+request_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_scope", default=None)
+
+
+def route_of(scope: dict) -> Tuple[str, str]:
+    """(method, route template) of a request scope; WebSockets have no method."""
+    route = scope.get("route")
+    return scope.get("method", "WS"), route.path if route is not None else "<unmatched>"
+
+
+def current_route() -> str:
+    """Method and route template of the current request, or "-" outside one."""
+    scope = request_scope.get()
+    if scope is None:
+        return "-"
+    return "%s %s" % route_of(scope)
+
+
+class RouteContextMiddleware:
+    """Publishes the request scope to request_scope for code below the router."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        token = request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_scope.reset(token)
+
+
+class _Timing:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else None,
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class PoolMonitor:
+    """Acquire wait and hold times for one engine's connection pool."""
+
+    def __init__(self, name: str, warn_after: float = DB_HOLD_WARN_SECONDS):
+        self.name = name
+        self.warn_after = warn_after
+        self.engine: Optional[Engine] = None
+        self.wait = _Timing()
+        self.hold = _Timing()
+        self.hold_by_route: Dict[str, _Timing] = {}
+        self.timeouts = 0
+        self.long_holds = 0
+        self._lock = threading.Lock()
+
+    def attach(self, engine: Engine):
+        self.engine = engine
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait.add(seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        connection_record.info["route"] = current_route()
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        route = connection_record.info.pop("route", "-")
+        if started is None:
+            return
+        held = time.perf_counter() - started
+        with self._lock:
+            self.hold.add(held)
+            self.hold_by_route.setdefault(route, _Timing()).add(held)
+            if held > self.warn_after:
+                self.long_holds += 1
+        if held > self.warn_after:
+            logger.warning("%s pool connection held for %.2fs by %s", self.name, held, route)
+
+    def stats(self) -> dict:
+        pool = self.engine.pool if self.engine is not None else None
+        result = {"pool": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            result.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+                "max_overflow": pool._max_overflow,
+            })
+        with self._lock:
+            result.update({
+                "timeouts": self.timeouts,
+                "long_holds": self.long_holds,
+                "wait": self.wait.as_dict(),
+                "hold": self.hold.as_dict(),
+                "hold_by_route": {route: timing.as_dict() for route, timing in self.hold_by_route.items()},
+            })
+        return result
+
+
+# Keyed by pool logging name, which survives Pool.recreate() on dispose
+pool_monitors: Dict[str, PoolMonitor] = {}
+
+
+class _TimedConnectMixin:
+    def connect(self):
+        monitor = pool_monitors.get(self._orig_logging_name)
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            if monitor:
+                monitor.record_timeout()
+            raise
+        if monitor:
+            monitor.record_wait(time.perf_counter() - started)
+        return connection
+
+
+class InstrumentedQueuePool(_TimedConnectMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedConnectMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def monitor_engine(name: str, engine: Engine) -> PoolMonitor:
+    monitor = pool_monitors[name] = PoolMonitor(name)
+    monitor.attach(engine)
+    return monitor
@@ -0,0 +1,315 @@
+import asyncio
+import contextvars
+import cProfile
+import functools
+import hmac
+import importlib.util
+import json
+import logging
+import marshal
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .pool_monitor import route_of
+
+logger = logging.getLogger(__name__)
+
+# Requests are profiled when they carry PROFILE_HEADER with PROFILE_TOKEN
+# (empty = header disabled) or at random with PROFILE_SAMPLE_RATE.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile-Token").lower().encode("latin-1")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Ring buffer: only the newest PROFILE_KEEP profiles are kept in PROFILE_DIR
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+# "auto" uses pyinstrument when it is installed and cProfile otherwise
+PROFILER = os.getenv("PROFILER", "auto")
+PROFILE_MAX_STATEMENTS = 1000
+
+
+def _profiler_name(name: str) -> str:
+    if name == "auto":
+        return "pyinstrument" if importlib.util.find_spec("pyinstrument") is not None else "cprofile"
+    return name
+
+
+class _ProfiledRequest:
+    """One profiled request: its profiler output and the SQL it ran."""
+
+    def __init__(self, profile_id: str, trigger: str):
+        self.profile_id = profile_id
+        self.trigger = trigger
+        self.started = time.perf_counter()
+        self.output: Optional[bytes] = None
+        self.statements: List[dict] = []
+        self.statements_dropped = 0
+
+
+# Copied into the threadpool with the request context, so sync endpoints see it too
+_profiled_request: contextvars.ContextVar[Optional[_ProfiledRequest]] = contextvars.ContextVar(
+    "profiled_request", default=None
+)
+
+
+class RequestProfiler:
+    """Profiles selected requests and keeps the newest results on disk.
+
+    The profiler runs around the endpoint call in the thread that executes
+    it: the event loop for async endpoints and the worker thread for sync
+    ones. Dependencies and response rendering outside the endpoint are not
+    profiled. Under cProfile an async endpoint's profile also contains
+    whatever other requests ran on the loop while it was awaiting;
+    pyinstrument attributes await time to the request itself.
+
+    One request is profiled at a time; requests selected while another is
+    being profiled run normally and are counted as skipped.
+    """
+
+    def __init__(self, token: str = PROFILE_TOKEN, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP, profiler: str = PROFILER):
+        self.token = token.encode()
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.keep = keep
+        self.profiler = _profiler_name(profiler)
+        self.written = 0
+        self.skipped = 0
+        self.rejected = 0
+        self._sequence = 0
+        self._busy = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_rate > 0
+
+    def select(self, scope) -> Optional[str]:
+        """How this request was selected for profiling, or None."""
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    if hmac.compare_digest(value, self.token):
+                        return "header"
+                    self.rejected += 1
+                    break
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def begin(self) -> bool:
+        if self._busy.acquire(blocking=False):
+            return True
+        self.skipped += 1
+        return False
+
+    def end(self):
+        self._busy.release()
+
+    def next_id(self) -> str:
+        self._sequence += 1
+        return "%s-%d-%04d" % (datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S"), os.getpid(),
+                               self._sequence % 10000)
+
+    # Endpoint wrappers
+
+    def wrap_routes(self, routes):
+        """Profile the endpoints of every API route in routes when their request is selected."""
+        if not self.enabled:
+            return
+        for route in routes:
+            if isinstance(route, APIRoute):
+                route.dependant.call = self._wrap(route.dependant.call)
+
+    def _wrap(self, call):
+        if asyncio.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def profiled_async(*args, **kwargs):
+                request = _profiled_request.get()
+                if request is None:
+                    return await call(*args, **kwargs)
+                session = self._start(async_mode=True)
+                try:
+                    return await call(*args, **kwargs)
+                finally:
+                    request.output = self._stop(session)
+            return profiled_async
+
+        @functools.wraps(call)
+        def profiled(*args, **kwargs):
+            request = _profiled_request.get()
+            if request is None:
+                return call(*args, **kwargs)
+            session = self._start(async_mode=False)
+            try:
+                return call(*args, **kwargs)
+            finally:
+                request.output = self._stop(session)
+        return profiled
+
+    def _start(self, async_mode: bool):
+        if self.profiler == "pyinstrument":
+            from pyinstrument import Profiler
+
+            session = Profiler(async_mode="enabled" if async_mode else "disabled")
+            session.start()
+        else:
+            session = cProfile.Profile()
+            session.enable()
+        return session
+
+    def _stop(self, session) -> bytes:
+        if self.profiler == "pyinstrument":
+            session.stop()
+            return session.output_html().encode()
+        session.disable()
+        return _pstats_bytes(session)
+
+    # SQL timings
+
+    def attach(self, engine: Engine):
+        if not self.enabled:
+            return
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    # Output
+
+    @property
+    def extension(self) -> str:
+        return ".html" if self.profiler == "pyinstrument" else ".pstats"
+
+    def write(self, request: _ProfiledRequest, scope: dict, status_code: int, elapsed: float):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, request.profile_id)
+        if request.output is not None:
+            with open(base + self.extension, "wb") as f:
+                f.write(request.output)
+        method, route = route_of(scope)
+        sql_ms = sum(statement["ms"] for statement in request.statements)
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump({
+                "id": request.profile_id,
+                "trigger": request.trigger,
+                "method": method,
+                "route": route,
+                "path": scope["path"],
+                "status": status_code,
+                "duration_ms": round(elapsed * 1000, 2),
+                "profiler": self.profiler if request.output is not None else None,
+                "profile_file": os.path.basename(base + self.extension) if request.output is not None else None,
+                "sql_count": len(request.statements) + request.statements_dropped,
+                "sql_ms": round(sql_ms, 2),
+                "sql_statements_dropped": request.statements_dropped,
+                "sql": request.statements,
+            }, f, ensure_ascii=False, indent=1)
+        self.written += 1
+        self.prune()
+        logger.info("Profiled %s %s (%s) in %.1f ms: %s", method, route, request.trigger, elapsed * 1000, base)
+
+    def prune(self):
+        """Delete all but the newest keep profiles; ids sort by time."""
+        pattern = re.compile(r"^(\d{8}T\d{6}-\d+-\d{4})\.(json|html|pstats)$")
+        ids = sorted({match.group(1) for match in map(pattern.match, os.listdir(self.directory)) if match})
+        for profile_id in ids[:max(0, len(ids) - self.keep)]:
+            for extension in (".json", ".html", ".pstats"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + extension))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            "profiler": self.profiler,
+            "header": bool(self.token),
+            "sample_rate": self.sample_rate,
+            "directory": os.path.abspath(self.directory),
+            "keep": self.keep,
+            "written": self.written,
+            "skipped": self.skipped,
+            "rejected_tokens": self.rejected,
+        }
+
+
+def _pstats_bytes(profile: cProfile.Profile) -> bytes:
+    # What Profile.dump_stats() writes; loads in pstats, snakeviz and flameprof
+    profile.create_stats()
+    return marshal.dumps(profile.stats)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _profiled_request.get() is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    request = _profiled_request.get()
+    started = getattr(context, "_profile_started", None)
+    if request is None or started is None:
+        return
+    if len(request.statements) >= PROFILE_MAX_STATEMENTS:
+        request.statements_dropped += 1
+        return
+    request.statements.append({
+        "at_ms": round((started - request.started) * 1000, 2),
+        "ms": round((time.perf_counter() - started) * 1000, 3),
+        "statement": " ".join(statement.split()),
+    })
+
+
+request_profiler = RequestProfiler()
+
+
+class ProfilingMiddleware:
+    """Selects requests for request_profiler and writes their profile once the response is sent."""
+
+    def __init__(self, app, profiler: RequestProfiler = request_profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+        trigger = self.profiler.select(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        if not self.profiler.begin():
+            await self.app(scope, receive, send)
+            return
+
+        request = _ProfiledRequest(self.profiler.next_id(), trigger)
+        status_code = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if trigger == "header":
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-id", request.profile_id.encode())
+                    ]
+            await send(message)
+
+        token = _profiled_request.set(request)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            _profiled_request.reset(token)
+            elapsed = time.perf_counter() - request.started
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.profiler.write, request, scope, status_code, elapsed
+                )
+            except OSError:
+                logger.exception("Could not write profile %s", request.profile_id)
+            finally:
+                self.profiler.end()
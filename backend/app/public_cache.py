@@ -0,0 +1,95 @@
+import hashlib
+import os
+import threading
+from typing import Callable, Dict, NamedTuple, Optional
+
+from .cache import LRUCache, SingleFlight
+from .realtime import EventBus, bus
+
+PUBLIC_CACHE_SIZE = int(os.getenv("PUBLIC_CACHE_SIZE", "1024"))
+# Safety net for invalidations lost between workers; 0 = no expiry
+PUBLIC_CACHE_TTL = float(os.getenv("PUBLIC_CACHE_TTL", "300"))
+
+
+class CachedResponse(NamedTuple):
+    wishlist_id: int
+    body: bytes
+    etag: str
+
+
+def make_etag(body: bytes) -> str:
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+class PublicWishlistCache:
+    """Serialized public wishlist responses keyed by slug.
+
+    Entries are dropped by wishlist id whenever something on the list changes,
+    in this worker and, through the event bus, in every other worker. When
+    the bus may have missed events the whole cache is cleared, and entries
+    expire after ttl seconds in case an invalidation still got lost.
+    """
+
+    def __init__(self, max_size: int, bus: EventBus, ttl: float = PUBLIC_CACHE_TTL):
+        self._entries = LRUCache(max_size, on_evict=self._forget_slug, ttl=ttl or None)
+        self._flight = SingleFlight()
+        self._slugs: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        # Bumped on every invalidation, so a build that raced with a write
+        # is returned to its caller but never stored.
+        self._version = 0
+        self.bus = bus
+        bus.subscribe("invalidate", lambda event: self._invalidate_local(event["wishlist_id"]))
+        bus.subscribe("resync", lambda event: self.clear())
+
+    def get_or_build(self, slug: str, build: Callable[[], Optional[CachedResponse]]) -> Optional[CachedResponse]:
+        entry = self._entries.get(slug)
+        if entry is not None:
+            return entry
+        return self._flight.do(slug, lambda: self._build(slug, build))
+
+    def _build(self, slug: str, build: Callable[[], Optional[CachedResponse]]) -> Optional[CachedResponse]:
+        version = self._version
+        entry = build()
+        if entry is None:
+            return None
+        with self._lock:
+            if version == self._version:
+                self._slugs[entry.wishlist_id] = slug
+                self._entries.set(slug, entry)
+        return entry
+
+    def invalidate(self, wishlist_id: int):
+        self._invalidate_local(wishlist_id)
+        self.bus.publish("invalidate", {"wishlist_id": wishlist_id})
+
+    def _invalidate_local(self, wishlist_id: int):
+        with self._lock:
+            self._version += 1
+            slug = self._slugs.pop(wishlist_id, None)
+            if slug is not None:
+                self._entries.pop(slug)
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._slugs.clear()
+            self._entries.clear()
+
+    def _forget_slug(self, slug: str, entry: CachedResponse):
+        if self._slugs.get(entry.wishlist_id) == slug:
+            del self._slugs[entry.wishlist_id]
+
+    def stats(self) -> dict:
+        return {**self._entries.stats(), "coalesced": self._flight.coalesced}
+
+
+public_wishlist_cache = PublicWishlistCache(PUBLIC_CACHE_SIZE, bus)
@@ -0,0 +1,432 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_BACKEND = os.getenv("BROADCAST_BACKEND", "")
+BROADCAST_CHANNEL = os.getenv("BROADCAST_CHANNEL", "wishlist_events")
+BROADCAST_SOCKET_DIR = os.getenv("BROADCAST_SOCKET_DIR", "/tmp/wishlist-broadcast")
+# Postgres LISTEN reconnects back off exponentially up to this many seconds
+BROADCAST_RECONNECT_MAX = float(os.getenv("BROADCAST_RECONNECT_MAX", "30"))
+
+# Per-connection outbound queue; "drop" discards the oldest queued message
+# when it is full, "disconnect" closes the slow client instead.
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "64"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop")
+
+Receiver = Callable[[str], Awaitable[None]]
+
+
+class BroadcastBackend:
+    """Relays serialized events between worker processes.
+
+    publish() hands an event to every subscribed worker, including the
+    publishing one; EventBus drops its own events on receipt. A backend
+    that may have lost events (e.g. after a reconnect) awaits on_resync.
+    """
+
+    on_resync: Optional[Callable[[], Awaitable[None]]] = None
+
+    async def start(self, receiver: Receiver):
+        raise NotImplementedError
+
+    async def stop(self):
+        raise NotImplementedError
+
+    async def publish(self, data: str):
+        raise NotImplementedError
+
+
+class MemoryBroadcastBackend(BroadcastBackend):
+    """In-process stand-in: every backend sharing a hub sees every event."""
+
+    default_hub: List["MemoryBroadcastBackend"] = []
+
+    def __init__(self, hub: Optional[List["MemoryBroadcastBackend"]] = None):
+        self.hub = hub if hub is not None else self.default_hub
+        self._receiver: Optional[Receiver] = None
+
+    async def start(self, receiver: Receiver):
+        self._receiver = receiver
+        self.hub.append(self)
+
+    async def stop(self):
+        if self in self.hub:
+            self.hub.remove(self)
+
+    async def publish(self, data: str):
+        for backend in list(self.hub):
+            await backend._receiver(data)
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, receiver: Receiver):
+        self.receiver = receiver
+
+    def datagram_received(self, data: bytes, addr):
+        asyncio.ensure_future(self.receiver(data.decode("utf-8")))
+
+
+class LocalSocketBroadcastBackend(BroadcastBackend):
+    """Unix datagram sockets in a shared directory, one per worker.
+
+    For several workers on one host without Postgres (e.g. SQLite deployments).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = os.path.join(directory, "%d-%s.sock" % (os.getpid(), uuid.uuid4().hex[:8]))
+        self._transport = None
+        self._sender: Optional[socket.socket] = None
+
+    async def start(self, receiver: Receiver):
+        os.makedirs(self.directory, exist_ok=True)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self.path)
+        sock.setblocking(False)
+        self._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _DatagramProtocol(receiver), sock=sock
+        )
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+
+    async def stop(self):
+        if self._transport:
+            self._transport.close()
+        if self._sender:
+            self._sender.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    async def publish(self, data: str):
+        payload = data.encode("utf-8")
+        for name in os.listdir(self.directory):
+            if not name.endswith(".sock"):
+                continue
+            peer = os.path.join(self.directory, name)
+            try:
+                self._sender.sendto(payload, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Socket left behind by a worker that is gone
+                try:
+                    os.unlink(peer)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                logger.warning("Broadcast socket %s is full, dropping event", peer)
+
+
+class PostgresBroadcastBackend(BroadcastBackend):
+    """LISTEN/NOTIFY on a dedicated psycopg2 connection per worker."""
+
+    # NOTIFY payloads are limited to 8000 bytes by Postgres
+    MAX_PAYLOAD = 7999
+
+    def __init__(self, dsn: str, channel: str, reconnect_max: float = BROADCAST_RECONNECT_MAX):
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_max = reconnect_max
+        self.reconnects = 0
+        self._listen_conn = None
+        self._notify_conn = None
+        self._notify_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def _connect(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    def _connect_listener(self):
+        conn = self._connect()
+        with conn.cursor() as cursor:
+            cursor.execute('LISTEN "%s"' % self.channel)
+        return conn
+
+    async def start(self, receiver: Receiver):
+        loop = asyncio.get_running_loop()
+        self._listen_conn = await loop.run_in_executor(None, self._connect_listener)
+        self._notify_conn = await loop.run_in_executor(None, self._connect)
+        self._thread = threading.Thread(
+            target=self._listen, args=(loop, receiver), name="broadcast-listener", daemon=True
+        )
+        self._thread.start()
+
+    def _listen(self, loop: asyncio.AbstractEventLoop, receiver: Receiver):
+        delay = 0.5
+        while not self._stopping.is_set():
+            conn = self._listen_conn
+            try:
+                if conn is None:
+                    conn = self._listen_conn = self._connect_listener()
+                    self.reconnects += 1
+                    delay = 0.5
+                    logger.info("Broadcast listener reconnected to channel %s", self.channel)
+                    # Whatever was notified while disconnected is gone
+                    if self.on_resync is not None:
+                        asyncio.run_coroutine_threadsafe(self.on_resync(), loop)
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+            except Exception:
+                logger.warning("Broadcast listener connection lost, reconnecting in %.1fs", delay, exc_info=True)
+                self._listen_conn = None
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                self._stopping.wait(delay)
+                delay = min(delay * 2, self.reconnect_max)
+                continue
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                asyncio.run_coroutine_threadsafe(receiver(notify.payload), loop)
+
+    async def stop(self):
+        self._stopping.set()
+        if self._thread:
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+        for conn in (self._listen_conn, self._notify_conn):
+            if conn is not None:
+                conn.close()
+
+    def _notify(self, data: str):
+        with self._notify_lock, self._notify_conn.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, data))
+
+    async def publish(self, data: str):
+        if len(data.encode("utf-8")) > self.MAX_PAYLOAD:
+            logger.warning("Broadcast event too large for NOTIFY (%d bytes), dropping", len(data))
+            return
+        await asyncio.get_running_loop().run_in_executor(None, self._notify, data)
+
+
+def create_backend(name: str = BROADCAST_BACKEND) -> Optional[BroadcastBackend]:
+    if not name:
+        return None
+    if name == "memory":
+        return MemoryBroadcastBackend()
+    if name == "socket":
+        return LocalSocketBroadcastBackend(BROADCAST_SOCKET_DIR)
+    if name == "postgres":
+        from sqlalchemy.engine import make_url
+        from .database import DATABASE_URL
+
+        dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresBroadcastBackend(dsn, BROADCAST_CHANNEL)
+    raise ValueError(f"Unknown BROADCAST_BACKEND: {name}")
+
+
+class EventBus:
+    """Fans events out to the other workers and dispatches theirs by kind.
+
+    Without a backend (single worker) publish() is a no-op.
+    """
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self.backend: Optional[BroadcastBackend] = None
+        self._handlers: Dict[str, Callable[[dict], Optional[Awaitable[None]]]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._sender: Optional[asyncio.Task] = None
+
+    def subscribe(self, kind: str, handler: Callable[[dict], Optional[Awaitable[None]]]):
+        self._handlers[kind] = handler
+
+    async def start(self, backend: Optional[BroadcastBackend]):
+        if backend is None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._outbox = asyncio.Queue()
+        backend.on_resync = self._resync
+        await backend.start(self._receive)
+        self.backend = backend
+        self._sender = asyncio.create_task(self._send_loop())
+
+    async def stop(self):
+        if self.backend is None:
+            return
+        self._sender.cancel()
+        await self.backend.stop()
+        self.backend = None
+
+    def publish(self, kind: str, event: dict):
+        """Queue an event for the other workers. Safe to call from any thread."""
+        if self.backend is None:
+            return
+        data = json.dumps({"origin": self.worker_id, "kind": kind, "event": event})
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._outbox.put_nowait(data)
+        else:
+            self._loop.call_soon_threadsafe(self._outbox.put_nowait, data)
+
+    async def _send_loop(self):
+        while True:
+            data = await self._outbox.get()
+            try:
+                await self.backend.publish(data)
+            except Exception:
+                logger.exception("Failed to publish broadcast event")
+
+    async def _resync(self):
+        """Runs the "resync" handler: events from other workers may have been missed."""
+        await self._dispatch("resync", {})
+
+    async def _receive(self, data: str):
+        try:
+            envelope = json.loads(data)
+        except ValueError:
+            logger.warning("Ignoring malformed broadcast event")
+            return
+        if envelope.get("origin") == self.worker_id:
+            return
+        await self._dispatch(envelope.get("kind"), envelope.get("event"))
+
+    async def _dispatch(self, kind: str, event: dict):
+        handler = self._handlers.get(kind)
+        if handler is None:
+            return
+        try:
+            result = handler(event)
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception:
+            logger.exception("Broadcast handler for %r failed", kind)
+
+
+bus = EventBus()
+
+
+class ClientConnection:
+    """One WebSocket viewer with its own bounded outbound queue and writer task."""
+
+    def __init__(self, manager: "ConnectionManager", websocket: WebSocket, wishlist_id: int):
+        self.manager = manager
+        self.websocket = websocket
+        self.wishlist_id = wishlist_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=manager.queue_size)
+        self.writer = asyncio.create_task(self._write())
+
+    def enqueue(self, text: str):
+        try:
+            self.queue.put_nowait(text)
+            return
+        except asyncio.QueueFull:
+            pass
+        if self.manager.slow_consumer_policy == "disconnect":
+            self.manager.evict(self, code=1008, reason="Client too slow")
+            return
+        # Keep the newest state: drop the oldest queued message
+        self.queue.get_nowait()
+        self.queue.put_nowait(text)
+        self.manager.dropped_messages += 1
+
+    async def _write(self):
+        while True:
+            text = await self.queue.get()
+            try:
+                async with asyncio.timeout(self.manager.send_timeout):
+                    await self.websocket.send_text(text)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.manager.evict(self)
+                return
+
+
+class ConnectionManager:
+    def __init__(
+        self,
+        bus: EventBus,
+        queue_size: int = WS_QUEUE_SIZE,
+        send_timeout: float = WS_SEND_TIMEOUT,
+        slow_consumer_policy: str = WS_SLOW_CONSUMER_POLICY,
+    ):
+        self.active_connections: Dict[int, Set[ClientConnection]] = {}
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.slow_consumer_policy = slow_consumer_policy
+        self.dropped_messages = 0
+        self.evicted_connections = 0
+        self.bus = bus
+        bus.subscribe("ws", self._on_remote_broadcast)
+
+    async def connect(self, websocket: WebSocket, wishlist_id: int) -> ClientConnection:
+        await websocket.accept()
+        connection = ClientConnection(self, websocket, wishlist_id)
+        if wishlist_id not in self.active_connections:
+            self.active_connections[wishlist_id] = set()
+        self.active_connections[wishlist_id].add(connection)
+        return connection
+
+    def disconnect(self, connection: ClientConnection):
+        connection.writer.cancel()
+        connections = self.active_connections.get(connection.wishlist_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.active_connections[connection.wishlist_id]
+
+    def evict(self, connection: ClientConnection, code: int = 1011, reason: str = ""):
+        """Drop a failed or too slow connection and close its socket in the background."""
+        if connection not in self.active_connections.get(connection.wishlist_id, ()):
+            return
+        self.disconnect(connection)
+        self.evicted_connections += 1
+        asyncio.ensure_future(self._close(connection.websocket, code, reason))
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int, reason: str):
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    async def broadcast(self, wishlist_id: int, message: dict):
+        self.bus.publish("ws", {"wishlist_id": wishlist_id, "message": message})
+        await self.broadcast_local(wishlist_id, message)
+
+    async def broadcast_local(self, wishlist_id: int, message: dict):
+        connections = self.active_connections.get(wishlist_id)
+        if not connections:
+            return
+        # Serialized once (same encoding as WebSocket.send_json) and handed to
+        # each connection's writer, so a slow client never delays the others.
+        text = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+        for connection in list(connections):
+            connection.enqueue(text)
+
+    async def _on_remote_broadcast(self, event: dict):
+        await self.broadcast_local(event["wishlist_id"], event["message"])
+
+    def stats(self) -> dict:
+        return {
+            "wishlists": len(self.active_connections),
+            "connections": sum(len(c) for c in self.active_connections.values()),
+            "dropped_messages": self.dropped_messages,
+            "evicted_connections": self.evicted_connections,
+        }
+
+
+manager = ConnectionManager(bus)
@@ -1,51 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, BackgroundTasks
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict
-from decimal import Decimal
 
 from .. import models, schemas, auth
-from ..database import get_db, SessionLocal
-import json
+from ..database import get_db, get_async_db, AsyncSessionLocal
+from ..public_cache import public_wishlist_cache
+from ..realtime import manager
+from .wishlists import calculate_total_contributed
 
 router = APIRouter(prefix="/api/items", tags=["items"])
 
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[int, List[WebSocket]] = {}
-
-    async def connect(self, websocket: WebSocket, wishlist_id: int):
-        await websocket.accept()
-        if wishlist_id not in self.active_connections:
-            self.active_connections[wishlist_id] = []
-        self.active_connections[wishlist_id].append(websocket)
-
-    def disconnect(self, websocket: WebSocket, wishlist_id: int):
-        if wishlist_id in self.active_connections:
-            try:
-                self.active_connections[wishlist_id].remove(websocket)
-            except ValueError:
-                pass
-            if not self.active_connections[wishlist_id]:
-                del self.active_connections[wishlist_id]
-
-    async def broadcast(self, wishlist_id: int, message: dict):
-        if wishlist_id in self.active_connections:
-            for connection in self.active_connections[wishlist_id]:
-                try:
-                    await connection.send_json(message)
-                except Exception:
-                    pass
-
-
-manager = ConnectionManager()
-
-
 @router.put("/{item_id}", response_model=schemas.WishlistItemOwner)
 def update_item(
     item_id: int,
     item_update: schemas.WishlistItemUpdate,
-    current_user: models.User = Depends(auth.get_current_active_user),
+    current_user: auth.CachedUser = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     item = db.query(models.WishlistItem).filter(
@@ -75,10 +46,11 @@ def update_item(
     
     db.commit()
     db.refresh(item)
+    public_wishlist_cache.invalidate(item.wishlist_id)
     
     item_dict = {
         **item.__dict__,
-        'total_contributed': sum([c.amount for c in item.contributions]) if item.contributions else None
+        'total_contributed': calculate_total_contributed(item)
     }
     
     return item_dict
@@ -88,12 +60,10 @@ def update_item(
 async def delete_item(
     item_id: int,
     background_tasks: BackgroundTasks,
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: auth.CachedUser = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    item = db.query(models.WishlistItem).filter(
-        models.WishlistItem.id == item_id
-    ).first()
+    item = await db.get(models.WishlistItem, item_id)
     
     if not item:
         raise HTTPException(
@@ -101,10 +71,12 @@ async def delete_item(
             detail="Item not found"
         )
     
-    wishlist = db.query(models.Wishlist).filter(
-        models.Wishlist.id == item.wishlist_id,
-        models.Wishlist.owner_id == current_user.id
-    ).first()
+    wishlist = (await db.execute(
+        select(models.Wishlist).where(
+            models.Wishlist.id == item.wishlist_id,
+            models.Wishlist.owner_id == current_user.id
+        )
+    )).scalar_one_or_none()
     
     if not wishlist:
         raise HTTPException(
@@ -112,18 +84,17 @@ async def delete_item(
             detail="Not authorized to delete this item"
         )
     
-    if item.contributions:
-        total_contributed = sum(c.amount for c in item.contributions)
-        if total_contributed > 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Cannot delete item with {len(item.contributions)} contributions totaling {total_contributed}. Please handle contributions first."
-            )
+    if item.contributors_count and item.total_contributed > 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot delete item with {item.contributors_count} contributions totaling {item.total_contributed}. Please handle contributions first."
+        )
     
     wishlist_id = item.wishlist_id
     
-    db.delete(item)
-    db.commit()
+    await db.delete(item)
+    await db.commit()
+    public_wishlist_cache.invalidate(wishlist_id)
     
     background_tasks.add_task(
         manager.broadcast,
@@ -142,11 +113,9 @@ async def delete_item(
 async def reserve_item(
     item_id: int,
     reservation: schemas.ReservationCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    item = db.query(models.WishlistItem).filter(
-        models.WishlistItem.id == item_id
-    ).first()
+    item = await db.get(models.WishlistItem, item_id)
     
     if not item:
         raise HTTPException(
@@ -154,9 +123,7 @@ async def reserve_item(
             detail="Item not found"
         )
     
-    wishlist = db.query(models.Wishlist).filter(
-        models.Wishlist.id == item.wishlist_id
-    ).first()
+    wishlist = await db.get(models.Wishlist, item.wishlist_id)
     
     if not wishlist:
         raise HTTPException(
@@ -189,8 +156,9 @@ async def reserve_item(
     item.is_reserved = True
     
     db.add(db_reservation)
-    db.commit()
-    db.refresh(db_reservation)
+    await db.commit()
+    public_wishlist_cache.invalidate(wishlist.id)
+    await db.refresh(db_reservation)
     
     await manager.broadcast(wishlist.id, {
         "type": "reservation",
@@ -209,11 +177,9 @@ async def reserve_item(
 async def cancel_reservation(
     item_id: int,
     cancel_data: schemas.ReservationCancel,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    item = db.query(models.WishlistItem).filter(
-        models.WishlistItem.id == item_id
-    ).first()
+    item = await db.get(models.WishlistItem, item_id)
     
     if not item:
         raise HTTPException(
@@ -221,10 +187,12 @@ async def cancel_reservation(
             detail="Item not found"
         )
     
-    reservation = db.query(models.Reservation).filter(
-        models.Reservation.item_id == item_id,
-        models.Reservation.reserver_email == cancel_data.reserver_email
-    ).first()
+    reservation = (await db.execute(
+        select(models.Reservation).where(
+            models.Reservation.item_id == item_id,
+            models.Reservation.reserver_email == cancel_data.reserver_email
+        )
+    )).scalars().first()
     
     if not reservation:
         raise HTTPException(
@@ -232,21 +200,22 @@ async def cancel_reservation(
             detail="Reservation not found or email doesn't match"
         )
     
-    db.delete(reservation)
-    db.flush()
+    await db.delete(reservation)
+    await db.flush()
     
-    remaining_reservations = db.query(models.Reservation).filter(
-        models.Reservation.item_id == item_id
-    ).count()
+    remaining_reservations = await db.scalar(
+        select(func.count()).select_from(models.Reservation).where(
+            models.Reservation.item_id == item_id
+        )
+    )
     
     if remaining_reservations == 0:
         item.is_reserved = False
     
-    db.commit()
+    await db.commit()
+    public_wishlist_cache.invalidate(item.wishlist_id)
     
-    wishlist = db.query(models.Wishlist).filter(
-        models.Wishlist.id == item.wishlist_id
-    ).first()
+    wishlist = await db.get(models.Wishlist, item.wishlist_id)
     
     if not wishlist:
         return None
@@ -265,11 +234,9 @@ async def cancel_reservation(
 async def contribute_to_item(
     item_id: int,
     contribution: schemas.ContributionCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    item = db.query(models.WishlistItem).filter(
-        models.WishlistItem.id == item_id
-    ).first()
+    item = await db.get(models.WishlistItem, item_id)
     
     if not item:
         raise HTTPException(
@@ -277,9 +244,7 @@ async def contribute_to_item(
             detail="Item not found"
         )
     
-    wishlist = db.query(models.Wishlist).filter(
-        models.Wishlist.id == item.wishlist_id
-    ).first()
+    wishlist = await db.get(models.Wishlist, item.wishlist_id)
     
     if not wishlist:
         raise HTTPException(
@@ -305,29 +270,47 @@ async def contribute_to_item(
             detail="Item price is not set"
         )
     
-    total_contributed = sum([c.amount for c in item.contributions]) if item.contributions else Decimal(0)
-    if total_contributed + contribution.amount > item.price:
+    # Price cap check, increment and is_reserved flip in a single statement,
+    # so concurrent contributions can never overshoot the price. Rounded to
+    # cents because SQLite stores NUMERIC as REAL (0.1 + 0.2 > 0.3).
+    new_total = func.round(models.WishlistItem.total_contributed + contribution.amount, 2)
+    totals = (await db.execute(
+        update(models.WishlistItem)
+        .where(
+            models.WishlistItem.id == item_id,
+            new_total <= models.WishlistItem.price
+        )
+        .values(
+            total_contributed=new_total,
+            contributors_count=models.WishlistItem.contributors_count + 1,
+            is_reserved=case(
+                (new_total >= models.WishlistItem.price, True),
+                else_=models.WishlistItem.is_reserved
+            )
+        )
+        .returning(models.WishlistItem.total_contributed, models.WishlistItem.is_reserved)
+        .execution_options(synchronize_session=False)
+    )).first()
+    
+    if totals is None:
+        await db.rollback()
+        await db.refresh(item)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Contribution would exceed item price. Remaining: {item.price - total_contributed}"
+            detail=f"Contribution would exceed item price. Remaining: {item.price - item.total_contributed}"
         )
     
+    total_contributed, is_reserved = totals
+    
     db_contribution = models.Contribution(
         **contribution.dict(),
         item_id=item_id
     )
     
     db.add(db_contribution)
-    db.commit()
-    db.refresh(db_contribution)
-    
-    db.refresh(item)
-    total_contributed = sum([c.amount for c in item.contributions])
-    
-    if total_contributed >= item.price:
-        item.is_reserved = True
-        db.commit()
-        db.refresh(item)
+    await db.commit()
+    public_wishlist_cache.invalidate(wishlist.id)
+    await db.refresh(db_contribution)
     
     await manager.broadcast(wishlist.id, {
         "type": "contribution",
@@ -337,7 +320,7 @@ async def contribute_to_item(
             "contributor_name": contribution.contributor_name,
             "amount": float(contribution.amount),
             "total_contributed": float(total_contributed),
-            "is_reserved": item.is_reserved
+            "is_reserved": is_reserved
         }
     })
     
@@ -346,22 +329,17 @@ async def contribute_to_item(
 
 @router.websocket("/ws/{wishlist_id}")
 async def websocket_endpoint(websocket: WebSocket, wishlist_id: int):
-    db = SessionLocal()
-    try:
-        wishlist = db.query(models.Wishlist).filter(
-            models.Wishlist.id == wishlist_id
-        ).first()
+    async with AsyncSessionLocal() as db:
+        wishlist = await db.get(models.Wishlist, wishlist_id)
         if not wishlist or not wishlist.is_public:
             await websocket.close(code=1008)
             return
-    finally:
-        db.close()
 
-    await manager.connect(websocket, wishlist_id)
+    connection = await manager.connect(websocket, wishlist_id)
     try:
         while True:
             data = await websocket.receive_text()
     except (WebSocketDisconnect, Exception):
         pass
     finally:
-        manager.disconnect(websocket, wishlist_id)
+        manager.disconnect(connection)
@@ -1,15 +1,42 @@
 from typing import Optional, Tuple
 from fastapi import APIRouter, HTTPException
-from pydantic import HttpUrl
+from fastapi.responses import StreamingResponse
+from pydantic import HttpUrl, ValidationError, parse_obj_as
+import asyncio
 import httpx
-from bs4 import BeautifulSoup
+import json
+import os
 import re
+import time
 from decimal import Decimal
 
-from .. import schemas
+from .. import metrics, schemas
+from ..extractors import PriceMatch, extract_json_ld_price, find_extractor
+from ..html_parser import make_soup
+from ..http_client import http_client_pool
+from ..url_cache import url_metadata_cache
 
 router = APIRouter(prefix="/api/url", tags=["url"])
 
+# Product pages run to several MB; metadata lives in <head> and near the top of
+# <body>, so only </head> plus HTML_HEAD_BUDGET bytes (at most HTML_MAX_BYTES)
+# are downloaded and parsed unless HTML_STREAMING is turned off.
+HTML_STREAMING = os.getenv("HTML_STREAMING", "true").lower() in ("1", "true", "yes")
+HTML_HEAD_BUDGET = int(os.getenv("HTML_HEAD_BUDGET", "262144"))
+HTML_MAX_BYTES = int(os.getenv("HTML_MAX_BYTES", "2097152"))
+
+URL_BATCH_MAX_URLS = int(os.getenv("URL_BATCH_MAX_URLS", "50"))
+URL_BATCH_CONCURRENCY = int(os.getenv("URL_BATCH_CONCURRENCY", "8"))
+URL_BATCH_TIMEOUT = float(os.getenv("URL_BATCH_TIMEOUT", "15"))
+
+PRICE_PATTERNS = [
+    re.compile(r'(?:цена|price)[:\s]*([0-9\s,.]+)\s*(?:₽|руб|rub|\$|usd|€|eur)', re.IGNORECASE),
+    re.compile(r'([0-9\s,.]+)\s*(?:₽|руб|rub|\$|usd|€|eur)', re.IGNORECASE),
+]
+
+# Shared by all batch requests: caps concurrent fetches process-wide
+batch_semaphore = asyncio.Semaphore(URL_BATCH_CONCURRENCY)
+
 
 async def parse_price(price_text: str) -> Tuple[Optional[Decimal], str]:
     cleaned = re.sub(r'[^\d.,]', '', price_text)
@@ -42,117 +69,156 @@ async def parse_price(price_text: str) -> Tuple[Optional[Decimal], str]:
 
 @router.post("/parse", response_model=schemas.URLMetadata)
 async def parse_url(url: HttpUrl):
+    return await url_metadata_cache.get_or_fetch(str(url), fetch_metadata)
+
+
+async def parse_batch_entry(index: int, url: str) -> dict:
     try:
-        async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-            response = await client.get(
-                str(url),
-                headers={
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                }
+        valid_url = parse_obj_as(HttpUrl, url)
+    except ValidationError:
+        return {"index": index, "url": url, "error": {"status_code": 422, "detail": "Invalid URL"}}
+    
+    async with batch_semaphore:
+        try:
+            metadata = await asyncio.wait_for(
+                url_metadata_cache.get_or_fetch(str(valid_url), fetch_metadata),
+                URL_BATCH_TIMEOUT
             )
-            
-            if response.status_code != 200:
-                raise HTTPException(status_code=400, detail="Could not fetch URL")
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            metadata = {
-                "title": None,
-                "description": None,
-                "image_url": None,
-                "price": None,
-                "currency": None
-            }
-            
-            # Open Graph tags (highest priority)
-            og_title = soup.find("meta", property="og:title")
-            if og_title:
-                metadata["title"] = og_title.get("content")
-            
-            og_desc = soup.find("meta", property="og:description")
-            if og_desc:
-                metadata["description"] = og_desc.get("content")
-            
-            og_image = soup.find("meta", property="og:image")
-            if og_image:
-                metadata["image_url"] = og_image.get("content")
-            
-            og_price = soup.find("meta", property="og:price:amount")
-            og_currency = soup.find("meta", property="og:price:currency")
-            if og_price:
-                metadata["price"] = og_price.get("content")
-                if og_currency:
-                    metadata["currency"] = og_currency.get("content")
-            
-            # Fallback to standard meta tags
-            if not metadata["title"]:
-                title_tag = soup.find("title")
-                if title_tag:
-                    metadata["title"] = title_tag.string
-            
-            if not metadata["description"]:
-                desc_meta = soup.find("meta", attrs={"name": "description"})
-                if desc_meta:
-                    metadata["description"] = desc_meta.get("content")
-            
-            if not metadata["price"]:
-                price_patterns = [
-                    r'(?:цена|price)[:\s]*([0-9\s,.]+)\s*(?:₽|руб|rub|\$|usd|€|eur)',
-                    r'([0-9\s,.]+)\s*(?:₽|руб|rub|\$|usd|€|eur)',
-                ]
-                
-                text = soup.get_text()
-                for pattern in price_patterns:
-                    match = re.search(pattern, text, re.IGNORECASE)
-                    if match:
-                        price, currency = await parse_price(match.group(0))
-                        if price:
-                            metadata["price"] = str(price)
-                            metadata["currency"] = currency
-                            break
-            
-            # Store-specific parsing
-            url_lower = str(url).lower()
-            
-            # Ozon
-            if "ozon.ru" in url_lower:
-                price_elem = soup.find("span", {"class": re.compile(r".*price.*", re.I)})
-                if price_elem:
-                    price, currency = await parse_price(price_elem.get_text())
-                    if price:
-                        metadata["price"] = str(price)
-                        metadata["currency"] = currency
-            
-            # Wildberries
-            elif "wildberries.ru" in url_lower:
-                price_elem = soup.find("span", {"class": "price-block__final-price"})
-                if price_elem:
-                    price, currency = await parse_price(price_elem.get_text())
-                    if price:
-                        metadata["price"] = str(price)
-                        metadata["currency"] = currency
-            
-            # Yandex Market
-            elif "market.yandex.ru" in url_lower:
-                price_elem = soup.find("span", {"data-auto": "snippet-price-current"})
-                if price_elem:
-                    price, currency = await parse_price(price_elem.get_text())
-                    if price:
-                        metadata["price"] = str(price)
-                        metadata["currency"] = currency
-            
-            # Amazon
-            elif "amazon." in url_lower:
-                price_elem = soup.find("span", {"class": "a-price-whole"})
-                if price_elem:
-                    price, currency = await parse_price(price_elem.get_text())
-                    if price:
-                        metadata["price"] = str(price)
-                        metadata["currency"] = "USD"
-            
-            return metadata
-            
+        except asyncio.TimeoutError:
+            return {"index": index, "url": url, "error": {"status_code": 408, "detail": "Request timeout"}}
+        except HTTPException as e:
+            return {"index": index, "url": url, "error": {"status_code": e.status_code, "detail": e.detail}}
+    
+    return {"index": index, "url": url, "metadata": metadata}
+
+
+@router.post("/parse/batch")
+async def parse_url_batch(batch: schemas.URLBatchRequest):
+    """Streams one NDJSON line per URL, in completion order."""
+    if len(batch.urls) > URL_BATCH_MAX_URLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many URLs, at most {URL_BATCH_MAX_URLS} per batch"
+        )
+    
+    async def results():
+        tasks = [asyncio.create_task(parse_batch_entry(i, url)) for i, url in enumerate(batch.urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done, ensure_ascii=False) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+async def apply_price(metadata: dict, match: PriceMatch):
+    price_text, currency = match
+    price, parsed_currency = await parse_price(price_text)
+    if price:
+        metadata["price"] = str(price)
+        metadata["currency"] = currency or parsed_currency
+
+
+async def fetch_html(url: str) -> Tuple[httpx.Response, str]:
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        if HTML_STREAMING:
+            response, html = await http_client_pool.get_prefix(url, HTML_HEAD_BUDGET, HTML_MAX_BYTES)
+        else:
+            response = await http_client_pool.get(url)
+            html = response.text
+        outcome = f"{response.status_code // 100}xx"
+        return response, html
+    except httpx.TimeoutException:
+        outcome = "timeout"
+        raise
+    finally:
+        metrics.url_fetch_duration.observe((outcome,), time.perf_counter() - started)
+
+
+async def fetch_metadata(url: str) -> dict:
+    try:
+        response, html = await fetch_html(url)
+        
+        if response.status_code != 200:
+            raise HTTPException(status_code=400, detail="Could not fetch URL")
+        
+        return await extract_metadata(html, url)
+        
     except httpx.TimeoutException:
         raise HTTPException(status_code=408, detail="Request timeout")
     except Exception:
         raise HTTPException(status_code=400, detail="Error parsing URL")
+
+
+async def extract_metadata(html: str, url: str, parser: Optional[str] = None) -> dict:
+    soup = make_soup(html, parser)
+    
+    metadata = {
+        "title": None,
+        "description": None,
+        "image_url": None,
+        "price": None,
+        "currency": None
+    }
+    
+    # Open Graph tags (highest priority)
+    og_title = soup.find("meta", property="og:title")
+    if og_title:
+        metadata["title"] = og_title.get("content")
+    
+    og_desc = soup.find("meta", property="og:description")
+    if og_desc:
+        metadata["description"] = og_desc.get("content")
+    
+    og_image = soup.find("meta", property="og:image")
+    if og_image:
+        metadata["image_url"] = og_image.get("content")
+    
+    og_price = soup.find("meta", property="og:price:amount")
+    og_currency = soup.find("meta", property="og:price:currency")
+    if og_price:
+        metadata["price"] = og_price.get("content")
+        if og_currency:
+            metadata["currency"] = og_currency.get("content")
+    
+    # Fallback to standard meta tags
+    if not metadata["title"]:
+        title_tag = soup.find("title")
+        if title_tag and title_tag.string is not None:
+            # Plain str: a NavigableString keeps the whole tree alive in the cache
+            metadata["title"] = str(title_tag.string)
+    
+    if not metadata["description"]:
+        desc_meta = soup.find("meta", attrs={"name": "description"})
+        if desc_meta:
+            metadata["description"] = desc_meta.get("content")
+    
+    # Store-specific selectors win over Open Graph, then schema.org JSON-LD;
+    # the text-wide regex scan is the last resort
+    extractor = find_extractor(url)
+    if extractor:
+        match = extractor.extract(soup)
+        if match:
+            await apply_price(metadata, match)
+    
+    if not metadata["price"]:
+        match = extract_json_ld_price(soup)
+        if match:
+            await apply_price(metadata, match)
+    
+    if not metadata["price"]:
+        text = soup.get_text()
+        for pattern in PRICE_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                price, currency = await parse_price(match.group(0))
+                if price:
+                    metadata["price"] = str(price)
+                    metadata["currency"] = currency
+                    break
+    
+    return metadata
@@ -1,50 +1,201 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import and_, case, func, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from datetime import date, datetime
 from decimal import Decimal
+import base64
+import binascii
+import codecs
+import csv
+import io
+import json
+import os
 
-from .. import models, schemas, auth
-from ..database import get_db
+from .. import models, schemas, auth, serializers
+from ..database import SessionLocal, get_db, get_async_db
+from ..public_cache import CachedResponse, etag_matches, make_etag, public_wishlist_cache
+from ..serializers import FastJSONResponse
+from ..realtime import manager
 
 router = APIRouter(prefix="/api/wishlists", tags=["wishlists"])
 
+BULK_ITEMS_MAX = int(os.getenv("BULK_ITEMS_MAX", "1000"))
+# Item ids per "items_added" event: a bulk import is announced in chunks so
+# each event stays far below the 8000-byte Postgres NOTIFY payload limit
+ITEMS_ADDED_CHUNK = 200
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+INVALID_JSON = object()
+
+WISHLIST_PAGE_SIZE = int(os.getenv("WISHLIST_PAGE_SIZE", "20"))
+WISHLIST_PAGE_MAX = int(os.getenv("WISHLIST_PAGE_MAX", "100"))
+PAGE_ORDER = (models.Wishlist.created_at.desc(), models.Wishlist.id.desc())
+
+# Summary fields computed per list by the database. Items without a price
+# count towards neither total; reserved gifts count as fully funded.
+_item = models.WishlistItem
+SUMMARY_AGGREGATES = {
+    "item_count": func.count(_item.id),
+    "reserved_count": func.coalesce(func.sum(case((_item.is_reserved, 1), else_=0)), 0),
+    "total_price": func.sum(_item.price),
+    "funded_amount": func.coalesce(func.sum(case(
+        (_item.price.is_(None), None),
+        (_item.is_pooling, _item.total_contributed),
+        (_item.is_reserved, _item.price),
+        else_=0,
+    )), 0),
+}
+SUMMARY_FIELDS = set(schemas.WishlistSummary.__fields__) - {"items"}
+
+# Rows fetched per round trip by the export's server-side cursor
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# Reservations stay hidden from the owner, and so do contributor emails
+EXPORT_FIELDS = {
+    "wishlist": (models.Wishlist, [
+        "id", "title", "description", "slug", "is_public", "event_date", "created_at", "updated_at",
+    ]),
+    "item": (models.WishlistItem, [
+        "id", "wishlist_id", "title", "description", "url", "image_url", "price", "currency", "priority",
+        "is_reserved", "is_pooling", "total_contributed", "contributors_count", "created_at", "updated_at",
+    ]),
+    "contribution": (models.Contribution, [
+        "id", "item_id", "contributor_name", "amount", "message", "created_at",
+    ]),
+}
+EXPORT_CSV_COLUMNS = ["type"] + list(dict.fromkeys(
+    name for _, names in EXPORT_FIELDS.values() for name in names
+))
+
 
 def calculate_total_contributed(item: models.WishlistItem) -> Optional[Decimal]:
-    if not item.is_pooling or not item.contributions:
+    if not item.is_pooling or not item.contributors_count:
         return None
-    return sum([c.amount for c in item.contributions])
+    return item.total_contributed
+
+
+def load_wishlist_summaries(db: Session, fields: set, criteria: list, limit: Optional[int], include_items: bool) -> List[dict]:
+    """One aggregate query for the page, plus one for its items if requested."""
+    aggregates = fields & set(SUMMARY_AGGREGATES)
+    if "funded_percent" in fields:
+        aggregates |= {"total_price", "funded_amount"}
+    # id and created_at are always read: they make up the next cursor
+    columns = (fields - set(SUMMARY_AGGREGATES) - {"funded_percent"}) | {"id", "created_at"}
 
+    # The page is cut first so only its lists' items are aggregated
+    page = select(
+        *[getattr(models.Wishlist, name).label(name) for name in sorted(columns)]
+    ).where(*criteria).order_by(*PAGE_ORDER).limit(limit).subquery()
+    query = select(
+        *page.c,
+        *[SUMMARY_AGGREGATES[name].label(name) for name in sorted(aggregates)],
+    ).order_by(page.c.created_at.desc(), page.c.id.desc())
+    if aggregates:
+        query = query.outerjoin(
+            models.WishlistItem, models.WishlistItem.wishlist_id == page.c.id
+        ).group_by(*page.c)
+    summaries = [dict(row) for row in db.execute(query).mappings()]
 
-def enrich_wishlist(wishlist) -> dict:
-    wishlist_dict = wishlist.__dict__.copy()
-    wishlist_dict['items'] = []
-    for item in wishlist.items:
-        item_dict = item.__dict__.copy()
-        item_dict['total_contributed'] = calculate_total_contributed(item)
-        wishlist_dict['items'].append(item_dict)
-    return wishlist_dict
+    for summary in summaries:
+        if "funded_percent" in fields:
+            total = summary["total_price"]
+            summary["funded_percent"] = round(float(summary["funded_amount"] / total * 100), 1) if total else None
+
+    if include_items:
+        items = serializers.owner_items(db, [summary["id"] for summary in summaries])
+        for summary in summaries:
+            summary["items"] = items.get(summary["id"], [])
+    return summaries
+
+
+def encode_cursor(created_at: datetime, wishlist_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), wishlist_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, wishlist_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(wishlist_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def after_cursor(db: Session, cursor: str):
+    """Rows that come after the cursor in PAGE_ORDER."""
+    created_at, wishlist_id = decode_cursor(cursor)
+    column = models.Wishlist.created_at
+    if db.get_bind().dialect.name == "sqlite":
+        # CURRENT_TIMESTAMP is stored without fractional seconds but bound
+        # datetimes carry them, so compare normalized text on SQLite
+        column, created_at = func.datetime(column), func.datetime(created_at)
+    return or_(column < created_at, and_(column == created_at, models.Wishlist.id < wishlist_id))
+
+
+def split_list(value: Optional[str]) -> set:
+    return {part.strip() for part in (value or "").split(",") if part.strip()}
 
 
 @router.get("", response_model=List[schemas.WishlistOwner])
 def get_user_wishlists(
-    current_user: models.User = Depends(auth.get_current_active_user),
+    limit: Optional[int] = Query(None, ge=1, le=WISHLIST_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    current_user: auth.CachedUser = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    wishlists = db.query(models.Wishlist).filter(
-        models.Wishlist.owner_id == current_user.id
-    ).all()
+    """Every wishlist with its items, unless paginated or projected.
+
+    limit/cursor page through the lists newest first; the cursor of the next
+    page is returned in X-Next-Cursor. fields=title,slug,item_count,... returns
+    WishlistSummary objects with just those fields, plus items if include=items.
+    """
+    selected = split_list(fields)
+    unknown = (selected - SUMMARY_FIELDS) | (split_list(include) - {"items"})
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
     
-    result = []
-    for wishlist in wishlists:
-        result.append(enrich_wishlist(wishlist))
+    criteria = [models.Wishlist.owner_id == current_user.id]
+    if cursor is not None:
+        criteria.append(after_cursor(db, cursor))
+        limit = limit or WISHLIST_PAGE_SIZE
+    # One extra row tells whether there is a next page
+    fetch = limit + 1 if limit else None
     
-    return result
+    if not selected:
+        wishlists = serializers.owner_wishlists(db, *criteria, order_by=PAGE_ORDER if limit else (), limit=fetch)
+    else:
+        wishlists = load_wishlist_summaries(db, selected, criteria, fetch, "items" in split_list(include))
+    
+    headers = {}
+    if limit and len(wishlists) > limit:
+        wishlists = wishlists[:limit]
+        last = wishlists[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last["created_at"], last["id"])
+    
+    if not selected:
+        return FastJSONResponse(wishlists, headers=headers)
+    keep = selected | ({"items"} if "items" in split_list(include) else set())
+    return FastJSONResponse([
+        {name: summary[name] for name in schemas.WishlistSummary.__fields__ if name in keep}
+        for summary in wishlists
+    ], headers=headers)
 
 
 @router.post("", response_model=schemas.WishlistOwner, status_code=status.HTTP_201_CREATED)
 def create_wishlist(
     wishlist: schemas.WishlistCreate,
-    current_user: models.User = Depends(auth.get_current_active_user),
+    current_user: auth.CachedUser = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     slug = models.Wishlist.generate_slug()
@@ -63,31 +214,137 @@ def create_wishlist(
     return db_wishlist
 
 
+def iter_export_records(owner_id: int) -> Iterator[List[Tuple[str, dict]]]:
+    """Batches of (type, record) in wishlist -> item -> contribution order.
+
+    A single outer-join query read through a server-side cursor, so memory
+    does not depend on the size of the account. The generator opens its own
+    session: the request's session is closed before the body is streamed.
+    """
+    columns = [
+        getattr(model, name) for model, names in EXPORT_FIELDS.values() for name in names
+    ]
+    query = select(*columns).select_from(models.Wishlist).outerjoin(
+        models.WishlistItem, models.WishlistItem.wishlist_id == models.Wishlist.id
+    ).outerjoin(
+        models.Contribution, models.Contribution.item_id == models.WishlistItem.id
+    ).where(
+        models.Wishlist.owner_id == owner_id
+    ).order_by(
+        models.Wishlist.id, models.WishlistItem.id, models.Contribution.id
+    ).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    wishlist_width = len(EXPORT_FIELDS["wishlist"][1])
+    item_width = len(EXPORT_FIELDS["item"][1])
+    last_wishlist = last_item = None
+    db = SessionLocal()
+    try:
+        for rows in db.execute(query).partitions():
+            batch = []
+            for row in rows:
+                wishlist = row[:wishlist_width]
+                item = row[wishlist_width:wishlist_width + item_width]
+                contribution = row[wishlist_width + item_width:]
+                if wishlist[0] != last_wishlist:
+                    last_wishlist = wishlist[0]
+                    batch.append(("wishlist", dict(zip(EXPORT_FIELDS["wishlist"][1], wishlist))))
+                if item[0] is not None and item[0] != last_item:
+                    last_item = item[0]
+                    batch.append(("item", dict(zip(EXPORT_FIELDS["item"][1], item))))
+                if contribution[0] is not None:
+                    batch.append(("contribution", dict(zip(EXPORT_FIELDS["contribution"][1], contribution))))
+            yield batch
+    finally:
+        db.close()
+
+
+def export_json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def export_ndjson(owner_id: int) -> Iterator[str]:
+    for batch in iter_export_records(owner_id):
+        yield "".join(
+            json.dumps({"type": kind, **record}, default=export_json_default) + "\n"
+            for kind, record in batch
+        )
+
+
+def export_csv(owner_id: int) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, EXPORT_CSV_COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    for batch in iter_export_records(owner_id):
+        for kind, record in batch:
+            writer.writerow({
+                "type": kind,
+                **{
+                    name: value.isoformat() if isinstance(value, (date, datetime)) else value
+                    for name, value in record.items()
+                },
+            })
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    "ndjson": (export_ndjson, "application/x-ndjson"),
+    "csv": (export_csv, "text/csv"),
+}
+
+
+@router.get("/export")
+def export_wishlists(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user: auth.CachedUser = Depends(auth.get_current_active_user)
+):
+    """Everything the owner can see, streamed as NDJSON or CSV.
+
+    Each line/row has a type (wishlist, item or contribution) and follows
+    its parent.
+    """
+    generate, media_type = EXPORT_FORMATS[format]
+    filename = f"wishlists-{date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        generate(current_user.id),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get("/{wishlist_id}", response_model=schemas.WishlistOwner)
 def get_wishlist(
     wishlist_id: int,
-    current_user: models.User = Depends(auth.get_current_active_user),
+    current_user: auth.CachedUser = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    wishlist = db.query(models.Wishlist).filter(
+    wishlists = serializers.owner_wishlists(
+        db,
         models.Wishlist.id == wishlist_id,
         models.Wishlist.owner_id == current_user.id
-    ).first()
+    )
     
-    if not wishlist:
+    if not wishlists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Wishlist not found"
         )
     
-    return enrich_wishlist(wishlist)
+    return FastJSONResponse(wishlists[0])
 
 
 @router.put("/{wishlist_id}", response_model=schemas.WishlistOwner)
 def update_wishlist(
     wishlist_id: int,
     wishlist_update: schemas.WishlistUpdate,
-    current_user: models.User = Depends(auth.get_current_active_user),
+    current_user: auth.CachedUser = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     wishlist = db.query(models.Wishlist).filter(
@@ -106,14 +363,14 @@ def update_wishlist(
         setattr(wishlist, field, value)
     
     db.commit()
-    db.refresh(wishlist)
-    return enrich_wishlist(wishlist)
+    public_wishlist_cache.invalidate(wishlist_id)
+    return FastJSONResponse(serializers.owner_wishlists(db, models.Wishlist.id == wishlist_id)[0])
 
 
 @router.delete("/{wishlist_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_wishlist(
     wishlist_id: int,
-    current_user: models.User = Depends(auth.get_current_active_user),
+    current_user: auth.CachedUser = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     wishlist = db.query(models.Wishlist).filter(
@@ -129,39 +386,46 @@ def delete_wishlist(
     
     db.delete(wishlist)
     db.commit()
+    public_wishlist_cache.invalidate(wishlist_id)
     return None
 
 
-@router.get("/public/{slug}", response_model=schemas.WishlistGuest)
-def get_public_wishlist(slug: str, db: Session = Depends(get_db)):
-    wishlist = db.query(models.Wishlist).filter(
+def build_public_wishlist(db: Session, slug: str) -> Optional[CachedResponse]:
+    wishlist = serializers.guest_wishlist(
+        db,
         models.Wishlist.slug == slug,
         models.Wishlist.is_public == True
-    ).first()
+    )
     
     if not wishlist:
+        return None
+    
+    body = serializers.dumps(wishlist)
+    return CachedResponse(wishlist_id=wishlist["id"], body=body, etag=make_etag(body))
+
+
+@router.get("/public/{slug}", response_model=schemas.WishlistGuest)
+def get_public_wishlist(slug: str, request: Request, db: Session = Depends(get_db)):
+    cached = public_wishlist_cache.get_or_build(slug, lambda: build_public_wishlist(db, slug))
+    
+    if not cached:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Wishlist not found or not public"
         )
     
-    wishlist_dict = wishlist.__dict__.copy()
-    wishlist_dict['items'] = []
-    for item in wishlist.items:
-        item_dict = item.__dict__.copy()
-        item_dict['total_contributed'] = calculate_total_contributed(item)
-        item_dict['reservations'] = item.reservations
-        item_dict['contributions'] = item.contributions
-        wishlist_dict['items'].append(item_dict)
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
     
-    return wishlist_dict
+    return Response(content=cached.body, media_type="application/json", headers=headers)
 
 
 @router.post("/{wishlist_id}/items", response_model=schemas.WishlistItemOwner, status_code=status.HTTP_201_CREATED)
 def add_wishlist_item(
     wishlist_id: int,
     item: schemas.WishlistItemCreate,
-    current_user: models.User = Depends(auth.get_current_active_user),
+    current_user: auth.CachedUser = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
     wishlist = db.query(models.Wishlist).filter(
@@ -181,5 +445,154 @@ def add_wishlist_item(
     )
     db.add(db_item)
     db.commit()
+    public_wishlist_cache.invalidate(wishlist_id)
     db.refresh(db_item)
-    return db_item
+    
+    item_dict = {
+        **db_item.__dict__,
+        'total_contributed': calculate_total_contributed(db_item)
+    }
+    
+    return item_dict
+
+
+async def iter_lines(request: Request) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_csv_rows(request: Request) -> AsyncIterator[dict]:
+    header = None
+    record = ""
+    async for line in iter_lines(request):
+        record = f"{record}\n{line}" if record else line
+        # An odd number of quotes means a quoted field continues on the next line
+        if record.count('"') % 2:
+            continue
+        if record.strip():
+            values = next(csv.reader([record]))
+            if header is None:
+                header = [name.strip() for name in values]
+            else:
+                # Empty cells mean "not set", so schema defaults apply
+                yield {name: value for name, value in zip(header, values) if value != ""}
+        record = ""
+
+
+async def iter_ndjson_rows(request: Request) -> AsyncIterator[object]:
+    async for line in iter_lines(request):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield INVALID_JSON
+
+
+async def read_bulk_rows(request: Request) -> AsyncIterator[object]:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "application/json":
+        try:
+            rows = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array of items")
+        for row in rows:
+            yield row
+    elif content_type in NDJSON_TYPES:
+        async for row in iter_ndjson_rows(request):
+            yield row
+    elif content_type == "text/csv":
+        async for row in iter_csv_rows(request):
+            yield row
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send application/json, application/x-ndjson or text/csv"
+        )
+
+
+async def validate_bulk_rows(request: Request) -> Tuple[List[dict], List[dict]]:
+    items, errors = [], []
+    index = 0
+    async for row in read_bulk_rows(request):
+        if index >= BULK_ITEMS_MAX:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {BULK_ITEMS_MAX} items per request"
+            )
+        if row is INVALID_JSON:
+            errors.append({"row": index, "errors": [{"loc": [], "msg": "Invalid JSON", "type": "value_error.json"}]})
+        elif not isinstance(row, dict):
+            errors.append({"row": index, "errors": [{"loc": [], "msg": "Expected a JSON object", "type": "type_error"}]})
+        else:
+            try:
+                items.append(schemas.WishlistItemCreate.parse_obj(row).dict())
+            except ValidationError as e:
+                errors.append({"row": index, "errors": e.errors()})
+        index += 1
+    return items, errors
+
+
+@router.post("/{wishlist_id}/items/bulk", response_model=schemas.BulkItemsResult, status_code=status.HTTP_201_CREATED)
+async def add_wishlist_items_bulk(
+    wishlist_id: int,
+    request: Request,
+    partial: bool = False,
+    current_user: auth.CachedUser = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Import items from a JSON array, NDJSON or CSV (header row with item field names).
+
+    Invalid rows fail the whole request with 422 unless partial=true, in which
+    case the valid rows are created and the invalid ones are reported by index.
+    """
+    wishlist = (await db.execute(
+        select(models.Wishlist.id).where(
+            models.Wishlist.id == wishlist_id,
+            models.Wishlist.owner_id == current_user.id
+        )
+    )).first()
+    
+    if not wishlist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Wishlist not found"
+        )
+    
+    items, errors = await validate_bulk_rows(request)
+    if errors and not partial:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
+    
+    created = []
+    if items:
+        for item in items:
+            item["wishlist_id"] = wishlist_id
+        # One multi-row INSERT ... RETURNING for the whole batch
+        created = (await db.scalars(
+            insert(models.WishlistItem).returning(models.WishlistItem), items
+        )).all()
+        await db.commit()
+        public_wishlist_cache.invalidate(wishlist_id)
+        item_ids = [item.id for item in created]
+        for start in range(0, len(item_ids), ITEMS_ADDED_CHUNK):
+            await manager.broadcast(wishlist_id, {
+                "type": "items_added",
+                "wishlist_id": wishlist_id,
+                "data": {"item_ids": item_ids[start:start + ITEMS_ADDED_CHUNK]}
+            })
+    
+    created = [
+        {**item.__dict__, 'total_contributed': calculate_total_contributed(item)}
+        for item in created
+    ]
+    return {"created": created, "errors": errors}
@@ -37,6 +37,7 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
 
 
 class ContributionBase(BaseModel):
@@ -121,6 +122,16 @@ class WishlistItemOwner(WishlistItemBase):
         orm_mode = True
 
 
+class BulkItemError(BaseModel):
+    row: int
+    errors: List[dict]
+
+
+class BulkItemsResult(BaseModel):
+    created: List[WishlistItemOwner]
+    errors: List[BulkItemError] = []
+
+
 # Guest view: includes full reservation and contribution details
 class WishlistItemGuest(WishlistItemBase):
     id: int
@@ -144,6 +155,10 @@ class URLMetadata(BaseModel):
     currency: Optional[str] = None
 
 
+class URLBatchRequest(BaseModel):
+    urls: List[str] = Field(..., min_items=1)
+
+
 class WishlistBase(BaseModel):
     title: str = Field(..., min_length=1)
     description: Optional[str] = None
@@ -172,6 +187,24 @@ class WishlistOwner(WishlistBase):
         orm_mode = True
 
 
+# List-screen projection; GET /api/wishlists?fields= picks any subset of these
+class WishlistSummary(BaseModel):
+    id: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    slug: Optional[str] = None
+    is_public: Optional[bool] = None
+    owner_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    item_count: Optional[int] = None
+    reserved_count: Optional[int] = None
+    total_price: Optional[Decimal] = None
+    funded_amount: Optional[Decimal] = None
+    funded_percent: Optional[float] = None
+    items: Optional[List[WishlistItemOwner]] = None
+
+
 class WishlistGuest(BaseModel):
     id: int
     title: str
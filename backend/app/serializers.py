@@ -0,0 +1,133 @@
+"""Wishlist responses built straight from selected columns.
+
+Rows read here were validated by the schemas when they were written, so they
+are not run through pydantic again. Keys follow the schemas' field order and
+values are encoded by orjson the way jsonable_encoder + JSONResponse would
+encode them, so the bytes match the response_model output.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+# selectinload uses the same batch size for its IN lists
+IN_BATCH_SIZE = 500
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _fields(schema, *nested: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """(all fields in order, fields read from columns)"""
+    fields = tuple(schema.__fields__)
+    return fields, tuple(name for name in fields if name not in nested)
+
+
+WISHLIST_OWNER = _fields(schemas.WishlistOwner, "items")
+ITEM_OWNER = _fields(schemas.WishlistItemOwner)
+WISHLIST_GUEST = _fields(schemas.WishlistGuest, "items")
+ITEM_GUEST = _fields(schemas.WishlistItemGuest, "reservations", "contributions")
+RESERVATION = _fields(schemas.Reservation)
+CONTRIBUTION = _fields(schemas.Contribution)
+
+
+def _select(model, columns: Iterable[str], *extra):
+    return select(*[getattr(model, name) for name in columns], *extra)
+
+
+def _record(fields: Tuple[str, ...], row, **nested) -> dict:
+    values = row._mapping
+    return {name: nested[name] if name in nested else values[name] for name in fields}
+
+
+def _children(db: Session, query, foreign_key, parent_ids: List[int]) -> Dict[int, list]:
+    """Rows of query grouped by foreign_key, fetched IN_BATCH_SIZE parents at a time."""
+    grouped = defaultdict(list)
+    for start in range(0, len(parent_ids), IN_BATCH_SIZE):
+        batch = parent_ids[start:start + IN_BATCH_SIZE]
+        for row in db.execute(query.where(foreign_key.in_(batch))):
+            grouped[row._mapping[foreign_key.key]].append(row)
+    return grouped
+
+
+def _item_children(db: Session, model, columns: Tuple[str, ...], wishlist_id: int) -> Dict[int, list]:
+    """Rows of model for every item of one list, grouped by item id, in one query of any list size."""
+    item_ids = select(models.WishlistItem.id).where(models.WishlistItem.wishlist_id == wishlist_id)
+    grouped = defaultdict(list)
+    for row in db.execute(_select(model, columns).where(model.item_id.in_(item_ids)).order_by(model.id)):
+        grouped[row.item_id].append(row)
+    return grouped
+
+
+def _total_contributed(row) -> Optional[Decimal]:
+    # Same rule as routes.wishlists.calculate_total_contributed
+    values = row._mapping
+    if not values["is_pooling"] or not values["contributors_count"]:
+        return None
+    return values["total_contributed"]
+
+
+def owner_wishlists(db: Session, *criteria, order_by=(), limit: Optional[int] = None) -> List[dict]:
+    """WishlistOwner dicts: one query for the lists and one per 500 lists for items."""
+    fields, columns = WISHLIST_OWNER
+    rows = db.execute(
+        _select(models.Wishlist, columns).where(*criteria).order_by(*order_by).limit(limit)
+    ).all()
+    items = owner_items(db, [row.id for row in rows])
+    return [_record(fields, row, items=items.get(row.id, [])) for row in rows]
+
+
+def owner_items(db: Session, wishlist_ids: List[int]) -> Dict[int, List[dict]]:
+    """WishlistItemOwner dicts grouped by wishlist id."""
+    fields, columns = ITEM_OWNER
+    query = _select(models.WishlistItem, columns, models.WishlistItem.contributors_count).order_by(
+        models.WishlistItem.id
+    )
+    return {
+        wishlist_id: [_record(fields, row, total_contributed=_total_contributed(row)) for row in rows]
+        for wishlist_id, rows in _children(db, query, models.WishlistItem.wishlist_id, wishlist_ids).items()
+    }
+
+
+def guest_wishlist(db: Session, *criteria) -> Optional[dict]:
+    """WishlistGuest dict of the first matching list, in four queries."""
+    fields, columns = WISHLIST_GUEST
+    wishlist = db.execute(_select(models.Wishlist, columns).where(*criteria).limit(1)).first()
+    if wishlist is None:
+        return None
+
+    item_fields, item_columns = ITEM_GUEST
+    items = db.execute(
+        _select(models.WishlistItem, item_columns, models.WishlistItem.contributors_count).where(
+            models.WishlistItem.wishlist_id == wishlist.id
+        ).order_by(models.WishlistItem.id)
+    ).all()
+    reservations = _item_children(db, models.Reservation, RESERVATION[1], wishlist.id)
+    contributions = _item_children(db, models.Contribution, CONTRIBUTION[1], wishlist.id)
+    return _record(fields, wishlist, items=[
+        _record(
+            item_fields, item,
+            reservations=[_record(RESERVATION[0], row) for row in reservations.get(item.id, [])],
+            contributions=[_record(CONTRIBUTION[0], row) for row in contributions.get(item.id, [])],
+            total_contributed=_total_contributed(item),
+        )
+        for item in items
+    ])
@@ -0,0 +1,234 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .pool_monitor import current_route
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are aggregated by fingerprint on /stats; 0 = off
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "250"))
+# Share of slow statements that are also logged with an EXPLAIN
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+# A fingerprint's plan is captured again at most this often
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "300"))
+# Logged statements waiting for their EXPLAIN beyond this are dropped
+SLOW_QUERY_QUEUE_LIMIT = int(os.getenv("SLOW_QUERY_QUEUE_LIMIT", "32"))
+SLOW_QUERY_MAX_FINGERPRINTS = int(os.getenv("SLOW_QUERY_MAX_FINGERPRINTS", "500"))
+
+EXPLAIN_PREFIXES = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN ", "mysql": "EXPLAIN "}
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+OTHER = "<other>"
+
+# Applied in order: literals and every driver's placeholders become "?",
+# then IN lists and multi-row VALUES of any length collapse into one shape
+_FINGERPRINT_RULES = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\$\d+|%\(\w+\)s|%s"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"\?(?:, \?)+"), "?, ..."),
+    (re.compile(r"\(\?, \.\.\.\)(?:, \(\?, \.\.\.\))+"), "(?, ...), ..."),
+]
+_NUMBERED = re.compile(r"\$(\d+)")
+_PARAMS_SHOWN = 20
+
+
+def fingerprint(statement: str) -> str:
+    for pattern, replacement in _FINGERPRINT_RULES:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+def _redact_value(value):
+    if value is None or isinstance(value, (bool, int, float, Decimal, date, datetime)):
+        return value
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def redact(parameters):
+    """Numbers, dates and NULLs as they are; strings and blobs by length only."""
+    if isinstance(parameters, dict):
+        return {name: _redact_value(value) for name, value in list(parameters.items())[:_PARAMS_SHOWN]}
+    values = [_redact_value(value) for value in list(parameters or ())[:_PARAMS_SHOWN]]
+    if parameters and len(parameters) > _PARAMS_SHOWN:
+        values.append(f"... {len(parameters) - _PARAMS_SHOWN} more")
+    return values
+
+
+class _Statement:
+    __slots__ = ("count", "total", "max", "routes", "plan", "explained_at")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.routes: Dict[str, int] = {}
+        self.plan: Optional[List[str]] = None
+        self.explained_at = 0.0
+
+    def as_dict(self, fingerprint: str) -> dict:
+        return {
+            "fingerprint": fingerprint,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 1),
+            "avg_ms": round(self.total / self.count * 1000, 1),
+            "max_ms": round(self.max * 1000, 1),
+            "routes": dict(sorted(self.routes.items(), key=lambda entry: entry[1], reverse=True)),
+            "plan": self.plan,
+        }
+
+
+class SlowQueryLog:
+    """Times every statement on the attached engines and aggregates the slow ones.
+
+    The hot path costs two perf_counter() calls per statement. Sampled slow
+    statements are handed to a single background thread, which runs the
+    EXPLAIN on a connection of its own and writes the log line, so the
+    request that ran the statement never waits for it.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, sample_rate: float = SLOW_QUERY_SAMPLE_RATE,
+                 explain_interval: float = SLOW_QUERY_EXPLAIN_INTERVAL, queue_limit: int = SLOW_QUERY_QUEUE_LIMIT,
+                 max_fingerprints: int = SLOW_QUERY_MAX_FINGERPRINTS):
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self.explain_interval = explain_interval
+        self.queue_limit = queue_limit
+        self.max_fingerprints = max_fingerprints
+        self.explain_engine: Optional[Engine] = None
+        self.statements: Dict[str, _Statement] = {}
+        self.slow = 0
+        self.logged = 0
+        self.explained = 0
+        self.explain_errors = 0
+        self.dropped = 0
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query")
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def attach(self, engine: Engine, explain_engine: Engine):
+        """Watch engine's statements; plans are captured on explain_engine."""
+        if not self.enabled:
+            return
+        self.explain_engine = explain_engine
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed < self.threshold or context.execution_options.get("skip_slow_query_log"):
+            return
+        self.record(statement, parameters[0] if executemany and parameters else parameters,
+                    elapsed, current_route(), conn.dialect.paramstyle)
+
+    def record(self, statement: str, parameters, elapsed: float, route: str, paramstyle: str):
+        key = fingerprint(statement)
+        now = time.monotonic()
+        with self._lock:
+            self.slow += 1
+            entry = self.statements.get(key)
+            if entry is None:
+                if len(self.statements) >= self.max_fingerprints:
+                    key = OTHER
+                entry = self.statements.setdefault(key, _Statement())
+            entry.count += 1
+            entry.total += elapsed
+            entry.max = max(entry.max, elapsed)
+            entry.routes[route] = entry.routes.get(route, 0) + 1
+            if random.random() >= self.sample_rate:
+                return
+            if self.pending >= self.queue_limit:
+                self.dropped += 1
+                return
+            self.pending += 1
+            explain = key != OTHER and now - entry.explained_at >= self.explain_interval
+            if explain:
+                entry.explained_at = now
+        self._executor.submit(self._log, key, statement, parameters, elapsed, route, paramstyle, explain)
+
+    def _log(self, key: str, statement: str, parameters, elapsed: float, route: str, paramstyle: str, explain: bool):
+        try:
+            if explain:
+                plan = self.explain(statement, parameters, paramstyle)
+                with self._lock:
+                    self.statements[key].plan = plan
+            with self._lock:
+                plan = self.statements[key].plan
+                self.logged += 1
+            logger.warning(
+                "Slow query %.1f ms in %s: %s | params %s | plan: %s",
+                elapsed * 1000, route, " ".join(statement.split()), redact(parameters),
+                "; ".join(plan) if plan else "-",
+            )
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def explain(self, statement: str, parameters, paramstyle: str) -> Optional[List[str]]:
+        engine = self.explain_engine
+        prefix = EXPLAIN_PREFIXES.get(engine.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        if paramstyle != engine.dialect.paramstyle:
+            if paramstyle != "numeric_dollar" or engine.dialect.paramstyle not in ("pyformat", "format"):
+                return None
+            # asyncpg's $1 placeholders for psycopg2, which takes %s and escapes %
+            numbers = [int(number) - 1 for number in _NUMBERED.findall(statement)]
+            statement = _NUMBERED.sub("%s", statement.replace("%", "%%"))
+            parameters = tuple(parameters[number] for number in numbers)
+        try:
+            with engine.connect() as conn:
+                rows = conn.execution_options(skip_slow_query_log=True).exec_driver_sql(
+                    prefix + statement, parameters
+                ).all()
+        except Exception:
+            logger.debug("EXPLAIN failed for %s", statement, exc_info=True)
+            with self._lock:
+                self.explain_errors += 1
+            return None
+        with self._lock:
+            self.explained += 1
+        # The last column is the plan line on SQLite and PostgreSQL
+        return [str(row[-1]) for row in rows]
+
+    def stats(self, top: int = 20) -> dict:
+        with self._lock:
+            busiest = sorted(self.statements.items(), key=lambda entry: entry[1].total, reverse=True)[:top]
+            return {
+                "threshold_ms": round(self.threshold * 1000, 1),
+                "sample_rate": self.sample_rate,
+                "slow": self.slow,
+                "logged": self.logged,
+                "explained": self.explained,
+                "explain_errors": self.explain_errors,
+                "dropped": self.dropped,
+                "fingerprints": len(self.statements),
+                "statements": [entry.as_dict(key) for key, entry in busiest],
+            }
+
+
+slow_query_log = SlowQueryLog()
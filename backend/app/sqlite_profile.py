@@ -0,0 +1,175 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+# Applied to SQLite databases only. WAL lets readers run alongside the writer;
+# SQLITE_SERIALIZE_WRITES queues writers in-process instead of having them
+# spin on the file lock until busy_timeout runs out.
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "true").lower() in ("1", "true", "yes")
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 2 ** 20)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB
+SQLITE_SERIALIZE_WRITES = os.getenv("SQLITE_SERIALIZE_WRITES", "true").lower() in ("1", "true", "yes")
+SQLITE_WRITE_TIMEOUT = float(os.getenv("SQLITE_WRITE_TIMEOUT", "30"))
+
+PRAGMAS = {
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "cache_size": SQLITE_CACHE_SIZE,
+}
+
+_HOLDS_WRITER = "holds_sqlite_writer"
+
+
+def set_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+class WriterGate:
+    """One write transaction at a time per process.
+
+    A session takes the gate before its first write and gives it back when its
+    transaction ends. Sync sessions block on it from their worker thread; async
+    sessions first queue on an asyncio.Lock so the event loop never blocks.
+    """
+
+    def __init__(self, timeout: float = SQLITE_WRITE_TIMEOUT):
+        self.timeout = timeout
+        self.acquired = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+        self._loop_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+    def _record(self, started: float):
+        waited = time.perf_counter() - started
+        self.acquired += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    def acquire(self, session: Session):
+        if session.info.get(_HOLDS_WRITER):
+            return
+        started = time.perf_counter()
+        if not self._lock.acquire(blocking=False):
+            self.contended += 1
+            if not self._lock.acquire(timeout=self.timeout):
+                raise TimeoutError("Timed out waiting for the SQLite writer")
+        self._record(started)
+        session.info[_HOLDS_WRITER] = True
+
+    async def acquire_async(self, session: Session):
+        if session.info.get(_HOLDS_WRITER):
+            return
+        loop = asyncio.get_running_loop()
+        loop_lock = self._loop_locks.get(loop)
+        if loop_lock is None:
+            loop_lock = self._loop_locks[loop] = asyncio.Lock()
+        started = time.perf_counter()
+        await loop_lock.acquire()
+        try:
+            if not self._lock.acquire(blocking=False):
+                # Held by a sync session: wait for it on a worker thread
+                self.contended += 1
+                waiter = loop.run_in_executor(None, self._lock.acquire, True, self.timeout)
+                try:
+                    acquired = await asyncio.shield(waiter)
+                except asyncio.CancelledError:
+                    waiter.add_done_callback(lambda done: done.result() and self._lock.release())
+                    raise
+                if not acquired:
+                    raise TimeoutError("Timed out waiting for the SQLite writer")
+        except BaseException:
+            loop_lock.release()
+            raise
+        self._record(started)
+        session.info[_HOLDS_WRITER] = loop_lock
+
+    def release(self, session: Session):
+        held = session.info.pop(_HOLDS_WRITER, None)
+        if held is None:
+            return
+        self._lock.release()
+        if isinstance(held, asyncio.Lock):
+            held.release()
+
+    def stats(self) -> dict:
+        return {
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "wait_avg_ms": round(self.wait_total / self.acquired * 1000, 2) if self.acquired else None,
+            "wait_max_ms": round(self.wait_max * 1000, 2),
+        }
+
+
+writer_gate = WriterGate()
+
+
+class WriterSession(Session):
+    """Session that takes writer_gate before flushing or running DML."""
+
+
+class GatedAsyncSession(AsyncSession):
+    """AsyncSession that takes writer_gate without blocking the event loop."""
+
+    sync_session_class = WriterSession
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sync_session.info["async_session"] = True
+
+    def _has_changes(self) -> bool:
+        session = self.sync_session
+        return bool(session.new or session.dirty or session.deleted)
+
+    async def execute(self, statement, *args, **kwargs):
+        if getattr(statement, "is_dml", False):
+            await writer_gate.acquire_async(self.sync_session)
+        return await super().execute(statement, *args, **kwargs)
+
+    async def flush(self, objects=None):
+        if self._has_changes():
+            await writer_gate.acquire_async(self.sync_session)
+        await super().flush(objects)
+
+    async def commit(self):
+        if self._has_changes():
+            await writer_gate.acquire_async(self.sync_session)
+        await super().commit()
+
+
+@event.listens_for(WriterSession, "before_flush")
+def _before_flush(session, flush_context, instances):
+    if not session.info.get("async_session"):
+        writer_gate.acquire(session)
+
+
+@event.listens_for(WriterSession, "do_orm_execute")
+def _before_dml(orm_execute_state):
+    session = orm_execute_state.session
+    if not session.info.get("async_session") and (
+        orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete
+    ):
+        writer_gate.acquire(session)
+
+
+@event.listens_for(WriterSession, "after_transaction_end")
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None:
+        writer_gate.release(session)
@@ -0,0 +1,111 @@
+import copy
+import os
+from typing import Awaitable, Callable, NamedTuple
+from urllib.parse import parse_qsl, unquote_plus, urlencode, urlsplit, urlunsplit
+
+from fastapi import HTTPException
+
+from .cache import AsyncSingleFlight, LRUCache
+
+URL_CACHE_SIZE = int(os.getenv("URL_CACHE_SIZE", "2048"))
+URL_CACHE_TTL = float(os.getenv("URL_CACHE_TTL", "3600"))
+URL_CACHE_NEGATIVE_TTL = float(os.getenv("URL_CACHE_NEGATIVE_TTL", "60"))
+
+TRACKING_PARAMS = {
+    "gclid", "dclid", "fbclid", "yclid", "ysclid", "msclkid", "igshid",
+    "_openstat", "openstat", "mc_cid", "mc_eid", "utm",
+}
+TRACKING_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _is_tracking(key: str) -> bool:
+    key = key.lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
+
+
+def strip_tracking(url: str) -> str:
+    """The URL to fetch: tracking params and fragment removed, everything else byte for byte."""
+    parts = urlsplit(url.strip())
+    query = "&".join(
+        pair for pair in parts.query.split("&")
+        if pair and not _is_tracking(unquote_plus(pair.split("=", 1)[0]))
+    )
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+
+def normalize_url(url: str) -> str:
+    """Cache key for a product URL: tracking params, fragment and default port removed."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking(key)
+    )
+    return urlunsplit((scheme, netloc, parts.path or "/", urlencode(query), ""))
+
+
+class _Failure(NamedTuple):
+    status_code: int
+    detail: str
+
+
+class URLMetadataCache:
+    """Parsed URL metadata keyed by normalized URL.
+
+    The key only groups equivalent URLs; the fetch goes to the URL as the
+    user sent it, minus tracking params, because hosts without a "www."-less
+    record and order-sensitive or signed query strings break on the
+    normalized form. Failed fetches are cached too (for negative_ttl), and concurrent requests
+    for the same URL share one fetch.
+    """
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float):
+        self.negative_ttl = negative_ttl
+        # Lookups answered from a cached failure, and fetches that failed
+        self.negative_hits = 0
+        self.fetch_failures = 0
+        self._entries = LRUCache(max_size, ttl=ttl)
+        self._flight = AsyncSingleFlight()
+
+    async def get_or_fetch(self, url: str, fetch: Callable[[str], Awaitable[dict]]) -> dict:
+        key = normalize_url(url)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = await self._flight.do(key, lambda: self._fetch(key, strip_tracking(url), fetch))
+        elif isinstance(entry, _Failure):
+            self.negative_hits += 1
+        if isinstance(entry, _Failure):
+            raise HTTPException(status_code=entry.status_code, detail=entry.detail)
+        return copy.deepcopy(entry)
+
+    async def _fetch(self, key: str, url: str, fetch: Callable[[str], Awaitable[dict]]):
+        try:
+            metadata = await fetch(url)
+        except HTTPException as e:
+            self.fetch_failures += 1
+            failure = _Failure(e.status_code, e.detail)
+            self._entries.set(key, failure, ttl=self.negative_ttl)
+            return failure
+        self._entries.set(key, metadata)
+        return metadata
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            **self._entries.stats(),
+            "coalesced": self._flight.coalesced,
+            "negative_hits": self.negative_hits,
+            "fetch_failures": self.fetch_failures,
+        }
+
+
+url_metadata_cache = URLMetadataCache(URL_CACHE_SIZE, URL_CACHE_TTL, URL_CACHE_NEGATIVE_TTL)
@@ -0,0 +1,106 @@
+import os
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from . import models
+from .cache import LRUCache
+from .realtime import EventBus, bus
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+
+class CachedUser(NamedTuple):
+    """Read-only snapshot of a users row, safe to share between requests."""
+    id: int
+    email: str
+    username: str
+    is_active: bool
+    avatar_url: Optional[str]
+    created_at: Optional[datetime]
+    oauth_provider: Optional[str]
+
+    @classmethod
+    def from_model(cls, user: models.User) -> "CachedUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            is_active=user.is_active,
+            avatar_url=user.avatar_url,
+            created_at=user.created_at,
+            oauth_provider=user.oauth_provider,
+        )
+
+
+class UserCache:
+    """Active users keyed by id, so authenticated requests skip the users query.
+
+    ORM updates and deletes of a user evict it here and, through the event bus,
+    in every other worker, once their transaction commits. Changes made
+    outside the ORM show up after ttl.
+
+    Every eviction bumps generation; a row read before an eviction is not
+    cached afterwards, so a request racing with a commit cannot put the old
+    row back.
+    """
+
+    def __init__(self, max_size: int, ttl: float, bus: EventBus):
+        self._entries = LRUCache(max_size, ttl=ttl)
+        self.generation = 0
+        self.bus = bus
+        bus.subscribe("user_invalidate", lambda event: self._evict(event["user_id"]))
+
+    def get(self, user_id: int) -> Optional[CachedUser]:
+        return self._entries.get(user_id)
+
+    def set(self, user: CachedUser, generation: int):
+        """Cache user as read from the database when generation was current."""
+        if user.is_active and generation == self.generation:
+            self._entries.set(user.id, user)
+
+    def _evict(self, user_id: int):
+        self.generation += 1
+        self._entries.pop(user_id)
+
+    def invalidate(self, user_id: int):
+        self._evict(user_id)
+        self.bus.publish("user_invalidate", {"user_id": user_id})
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL, bus)
+
+
+_PENDING = "user_cache_evictions"
+
+
+# Flush events fire before commit, while other requests still read the old
+# row; the ids are collected on the session and evicted once it commits.
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        user_cache.invalidate(target.id)
+        return
+    session.info.setdefault(_PENDING, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_committed(session):
+    for user_id in session.info.pop(_PENDING, ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,315 @@
+"""Load suite for the hot API paths, with results comparable to a baseline.
+
+Starts app.main:app in-process (uvicorn in a thread) against a fresh SQLite
+file, or against DATABASE_URL when it is set (e.g. a local Postgres), seeds
+it through the API and runs each scenario for --seconds:
+
+    public_read_storm   GET /api/wishlists/public/{slug}, half of them conditional
+    writes              reserve / cancel own gift + contribute to hot pooling items
+    dashboard           owners GET /api/wishlists (every list with its items)
+    dashboard_summary   owners GET /api/wishlists?limit=20&fields=...
+    ws_viewers          reserve / cancel on a list watched over WebSockets; latency
+                        is until every viewer got the event
+
+Each scenario reports throughput, p50/p95/p99 latency and SQL statements per
+request, counted on both engines in this process.
+
+Run from the backend directory:
+
+    python -m benchmarks.api_load --save-baseline /tmp/api_load.json
+    python -m benchmarks.api_load --baseline /tmp/api_load.json --max-regression 0.2
+
+With --baseline the exit status is 1 when a scenario's throughput drops or
+its p95 grows by more than --max-regression, or it issues more queries per
+request than before.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+
+from benchmarks.server import running_server, use_temporary_sqlite
+
+# Seeding registers users; the scenarios never hash passwords
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+SCENARIOS = ["public_read_storm", "writes", "dashboard", "dashboard_summary", "ws_viewers"]
+SUMMARY_FIELDS = "title,slug,item_count,reserved_count,funded_percent"
+
+statements = 0
+
+
+def count_statement(*args):
+    global statements
+    statements += 1
+
+
+def percentile_ms(ordered: list, p: float):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+
+    def record(self, started: float, status_code: int, ok: bool):
+        self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+        if ok:
+            self.latencies.append(time.perf_counter() - started)
+        else:
+            self.errors += 1
+
+    def result(self, elapsed: float, queries: int) -> dict:
+        ordered = sorted(self.latencies)
+        requests = len(ordered) + self.errors
+        return {
+            "requests": requests,
+            "errors": self.errors,
+            "throughput_rps": round(len(ordered) / elapsed, 1),
+            "p50_ms": percentile_ms(ordered, 0.5),
+            "p95_ms": percentile_ms(ordered, 0.95),
+            "p99_ms": percentile_ms(ordered, 0.99),
+            "queries_per_request": round(queries / requests, 2) if requests else None,
+            "statuses": {str(code): count for code, count in sorted(self.statuses.items())},
+        }
+
+
+async def register(client, name: str) -> dict:
+    response = await client.post("/api/auth/register", json={
+        "email": f"{name}@example.com", "username": name, "password": "benchmark"
+    })
+    response.raise_for_status()
+    return {"Authorization": "Bearer " + response.json()["access_token"]}
+
+
+async def create_list(client, headers: dict, title: str, items: list) -> dict:
+    wishlist = (await client.post("/api/wishlists", json={"title": title}, headers=headers)).json()
+    if items:
+        response = await client.post(f"/api/wishlists/{wishlist['id']}/items/bulk", json=items, headers=headers)
+        response.raise_for_status()
+        wishlist["item_ids"] = [item["id"] for item in response.json()["created"]]
+    return wishlist
+
+
+async def seed(client, args) -> dict:
+    run = str(int(time.time()))
+    owner = await register(client, f"load{run}")
+    viral = await create_list(client, owner, "viral", [
+        {"title": f"gift {n}", "description": "d" * 120, "price": 100 + n, "url": f"https://example.com/{n}"}
+        for n in range(args.public_items)
+    ])
+    writes = await create_list(client, owner, "writes", [{"title": f"gift {n}"} for n in range(args.concurrency)])
+    pools = await create_list(client, owner, "pools", [
+        {"title": f"pool {n}", "price": 10 ** 7, "is_pooling": True} for n in range(args.hot_pools)
+    ])
+    owners = []
+    for n in range(args.owners):
+        headers = await register(client, f"owner{run}x{n}")
+        for k in range(args.dashboard_lists):
+            await create_list(client, headers, f"list {k}", [
+                {"title": f"gift {i}", "price": 10 + i} for i in range(args.dashboard_items)
+            ])
+        owners.append(headers)
+    return {"viral": viral, "writes": writes, "pools": pools, "owners": owners}
+
+
+async def drive(request, concurrency: int, seconds: float) -> Recorder:
+    """Runs request(worker, step) -> (status, ok) in concurrency loops for seconds."""
+    import httpx
+
+    recorder = Recorder()
+    deadline = time.perf_counter() + seconds
+
+    async def loop(worker: int):
+        step = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status_code, ok = await request(worker, step)
+            except httpx.HTTPError:
+                status_code, ok = 0, False
+            recorder.record(started, status_code, ok)
+            step += 1
+
+    await asyncio.gather(*(loop(n) for n in range(concurrency)))
+    return recorder
+
+
+async def public_read_storm(client, data: dict, args) -> Recorder:
+    url = f"/api/wishlists/public/{data['viral']['slug']}"
+    etag = (await client.get(url)).headers["etag"]
+
+    async def request(worker: int, step: int):
+        headers = {"If-None-Match": etag} if step % 2 else {}
+        response = await client.get(url, headers=headers)
+        return response.status_code, response.status_code in (200, 304)
+
+    return await drive(request, args.concurrency, args.seconds)
+
+
+async def writes(client, data: dict, args) -> Recorder:
+    gifts = data["writes"]["item_ids"]
+    pools = data["pools"]["item_ids"]
+
+    async def request(worker: int, step: int):
+        email = f"w{worker}@example.com"
+        kind = step % 3
+        if kind == 0:
+            response = await client.post(f"/api/items/{gifts[worker]}/reserve",
+                                         json={"reserver_name": "load", "reserver_email": email})
+        elif kind == 1:
+            response = await client.request("DELETE", f"/api/items/{gifts[worker]}/reserve",
+                                            json={"reserver_email": email})
+        else:
+            response = await client.post(f"/api/items/{pools[worker % len(pools)]}/contribute",
+                                         json={"contributor_name": "load", "amount": 1})
+        return response.status_code, response.status_code < 300
+
+    return await drive(request, args.concurrency, args.seconds)
+
+
+def dashboard_scenario(params: dict):
+    async def scenario(client, data: dict, args) -> Recorder:
+        owners = data["owners"]
+
+        async def request(worker: int, step: int):
+            response = await client.get("/api/wishlists", params=params, headers=owners[worker % len(owners)])
+            return response.status_code, response.status_code == 200
+
+        return await drive(request, args.concurrency, args.seconds)
+    return scenario
+
+
+async def ws_viewers(client, data: dict, args, host: str) -> Recorder:
+    import websockets
+
+    wishlist_id = data["viral"]["id"]
+    item_ids = data["viral"]["item_ids"]
+    sockets = [await websockets.connect(f"ws://{host}/api/items/ws/{wishlist_id}") for _ in range(args.viewers)]
+    try:
+        async def request(worker: int, step: int):
+            item_id = item_ids[step % len(item_ids)]
+            if step // len(item_ids) % 2 == 0:
+                event = "reservation"
+                response = await client.post(f"/api/items/{item_id}/reserve",
+                                             json={"reserver_name": "probe", "reserver_email": "p@example.com"})
+            else:
+                event = "reservation_cancelled"
+                response = await client.request("DELETE", f"/api/items/{item_id}/reserve",
+                                                json={"reserver_email": "p@example.com"})
+            if response.status_code >= 300:
+                return response.status_code, False
+            for ws in sockets:
+                while True:
+                    message = json.loads(await asyncio.wait_for(ws.recv(), 30))
+                    if message.get("item_id") == item_id and message.get("type") == event:
+                        break
+            return response.status_code, True
+
+        # One probe at a time so every delivery is attributed to its write
+        return await drive(request, 1, args.seconds)
+    finally:
+        for ws in sockets:
+            await ws.close()
+
+
+async def run(host: str, args) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=f"http://{host}", limits=limits, timeout=60) as client:
+        data = await seed(client, args)
+        scenarios = {
+            "public_read_storm": public_read_storm,
+            "writes": writes,
+            "dashboard": dashboard_scenario({}),
+            "dashboard_summary": dashboard_scenario({"limit": 20, "fields": SUMMARY_FIELDS}),
+            "ws_viewers": lambda client, data, args: ws_viewers(client, data, args, host),
+        }
+        results = {}
+        for name in args.scenarios:
+            global statements
+            statements = 0
+            started = time.perf_counter()
+            recorder = await scenarios[name](client, data, args)
+            results[name] = recorder.result(time.perf_counter() - started, statements)
+        return results
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    failures = []
+    for name, before in baseline["scenarios"].items():
+        after = results.get(name)
+        if after is None:
+            continue
+        if after["throughput_rps"] < before["throughput_rps"] * (1 - max_regression):
+            failures.append(f"{name}: throughput {after['throughput_rps']} rps (baseline {before['throughput_rps']})")
+        if before["p95_ms"] and after["p95_ms"] and after["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            failures.append(f"{name}: p95 {after['p95_ms']} ms (baseline {before['p95_ms']})")
+        if (after["queries_per_request"] or 0) > (before["queries_per_request"] or 0) + 0.01:
+            failures.append(
+                f"{name}: {after['queries_per_request']} queries/request (baseline {before['queries_per_request']})"
+            )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--viewers", type=int, default=100)
+    parser.add_argument("--public-items", type=int, default=200)
+    parser.add_argument("--hot-pools", type=int, default=4)
+    parser.add_argument("--owners", type=int, default=8)
+    parser.add_argument("--dashboard-lists", type=int, default=30)
+    parser.add_argument("--dashboard-items", type=int, default=20)
+    parser.add_argument("--baseline", help="JSON written by --save-baseline to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed throughput/p95 change, 0.2 = 20%%")
+    parser.add_argument("--save-baseline", help="write this run's results to the given path")
+    args = parser.parse_args()
+
+    database_url = use_temporary_sqlite()
+    from sqlalchemy import event
+    from app.database import async_engine, engine
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+
+    with running_server() as host:
+        scenarios = asyncio.run(run(host, args))
+    result = {
+        "meta": {
+            "database": engine.dialect.name,
+            "sqlite_file": database_url.startswith("sqlite"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "options": {name: value for name, value in vars(args).items()
+                        if name not in ("baseline", "save_baseline", "max_regression")},
+        },
+        "scenarios": scenarios,
+    }
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = compare(scenarios, json.load(f), args.max_regression)
+        for failure in failures:
+            print("REGRESSION:", failure, file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
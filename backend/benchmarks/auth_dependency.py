@@ -0,0 +1,100 @@
+"""Cost per request of the auth dependency: email lookup vs. uid + user cache.
+
+"email_lookup" is the previous get_current_user: decode the JWT, then SELECT the
+user by email on a sync session. "uid_cached" is the current dependency with
+the user cached; "uid_miss" clears the cache before every call.
+
+Run from the backend directory:
+
+    python -m benchmarks.auth_dependency --calls 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.server import use_temporary_sqlite
+
+use_temporary_sqlite()
+
+from jose import jwt  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import auth, models  # noqa: E402
+from app.database import SessionLocal, async_engine, engine, init_db  # noqa: E402
+from app.user_cache import user_cache  # noqa: E402
+
+statements = 0
+
+
+def count_statement(*args):
+    global statements
+    statements += 1
+
+
+async def email_lookup(token: str):
+    payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+    db = SessionLocal()
+    try:
+        return auth.get_user_by_email(db, email=payload["sub"])
+    finally:
+        db.close()
+
+
+async def uid_cached(token: str):
+    return await auth.get_current_user(token)
+
+
+async def uid_miss(token: str):
+    user_cache.clear()
+    return await auth.get_current_user(token)
+
+
+async def measure(name: str, dependency, token: str, calls: int) -> dict:
+    global statements
+    for _ in range(min(calls, 100)):
+        await dependency(token)
+    statements = 0
+    started = time.perf_counter()
+    for _ in range(calls):
+        await dependency(token)
+    elapsed = time.perf_counter() - started
+    return {
+        "variant": name,
+        "us_per_call": round(elapsed / calls * 1e6, 1),
+        "queries_per_call": round(statements / calls, 2),
+    }
+
+
+async def run(calls: int) -> list:
+    init_db()
+    event.listen(engine, "before_cursor_execute", count_statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+
+    db = SessionLocal()
+    user = db.query(models.User).filter(models.User.email == "bench@example.com").first()
+    if user is None:
+        user = models.User(email="bench@example.com", username="bench", hashed_password="x")
+        db.add(user)
+        db.commit()
+    token = auth.create_access_token({"sub": user.email, "uid": user.id})
+    db.close()
+
+    results = [
+        await measure("email_lookup", email_lookup, token, calls),
+        await measure("uid_miss", uid_miss, token, calls),
+        await measure("uid_cached", uid_cached, token, calls),
+    ]
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.calls)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
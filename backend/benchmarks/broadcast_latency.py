@@ -0,0 +1,88 @@
+"""Broadcast delivery latency to many simulated WebSocket viewers of one list.
+
+Run from the backend directory:
+
+    python -m benchmarks.broadcast_latency --connections 10000 --messages 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from app.realtime import ConnectionManager, EventBus
+
+
+class FakeWebSocket:
+    def __init__(self, deliveries: list, delay: float):
+        self.deliveries = deliveries
+        self.delay = delay
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.deliveries.append((text, time.perf_counter()))
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    manager = ConnectionManager(EventBus(), send_timeout=args.send_timeout)
+    deliveries: list = []
+    for _ in range(args.connections):
+        delay = args.slow_delay if rng.random() < args.slow_fraction else rng.uniform(0, args.max_delay)
+        await manager.connect(FakeWebSocket(deliveries, delay), 1)
+
+    sent_at = {}
+    started = time.perf_counter()
+    for i in range(args.messages):
+        message = {"type": "item_update", "wishlist_id": 1, "item_id": i, "data": {}}
+        sent_at[json.dumps(message, separators=(",", ":"))] = time.perf_counter()
+        await manager.broadcast(1, message)
+        await asyncio.sleep(args.interval)
+
+    expected = args.connections * args.messages
+    deadline = time.perf_counter() + args.send_timeout + 5
+    while len(deliveries) < expected - manager.dropped_messages and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    latencies = [received - sent_at[text] for text, received in deliveries]
+
+    return {
+        **manager.stats(),
+        "messages": args.messages,
+        "delivered": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between broadcasts")
+    parser.add_argument("--max-delay", type=float, default=0.002, help="max per-send delay of a normal client")
+    parser.add_argument("--slow-fraction", type=float, default=0.01, help="share of slow clients")
+    parser.add_argument("--slow-delay", type=float, default=1.0, help="per-send delay of a slow client")
+    parser.add_argument("--send-timeout", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Peak memory of GET /api/wishlists/export as an account grows.
+
+Seeds one synthetic account per size (items spread over lists of
+--items-per-list, every tenth item pooling with two contributions), streams
+the export over HTTP and reports the traced peak while it runs. "load_all"
+is the same account loaded with serializers.owner_wishlists and encoded in
+one go, which is what an export built on the owner listing would do.
+
+Exits 1 if the streaming peak of the largest account is more than twice that
+of the smallest one (plus 1 MB of slack).
+
+Run from the backend directory:
+
+    python -m benchmarks.export_memory --sizes 10000 100000
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from typing import Tuple
+
+from benchmarks.server import running_server, use_temporary_sqlite
+
+use_temporary_sqlite()
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import auth, models, serializers  # noqa: E402
+from app.database import SessionLocal, init_db  # noqa: E402
+
+
+def seed(items: int, items_per_list: int) -> Tuple[int, str]:
+    db = SessionLocal()
+    user = models.User(email=f"export{items}@example.com", username=f"export{items}", hashed_password="x")
+    db.add(user)
+    db.commit()
+    lists = max(1, items // items_per_list)
+    wishlist_ids = db.scalars(insert(models.Wishlist).returning(models.Wishlist.id), [
+        {"title": f"list {n}", "slug": models.Wishlist.generate_slug(), "owner_id": user.id}
+        for n in range(lists)
+    ]).all()
+    rows = [
+        {"wishlist_id": wishlist_ids[n % lists], "title": f"gift {n}", "description": "x" * 100,
+         "url": f"https://example.com/gift/{n}", "price": 1000, "is_pooling": n % 10 == 0,
+         "total_contributed": 300 if n % 10 == 0 else 0, "contributors_count": 2 if n % 10 == 0 else 0}
+        for n in range(items)
+    ]
+    item_ids = db.scalars(insert(models.WishlistItem).returning(models.WishlistItem.id), rows).all()
+    db.execute(insert(models.Contribution), [
+        {"item_id": item_id, "contributor_name": f"friend {k}", "amount": 150}
+        for item_id, row in zip(item_ids, rows) if row["is_pooling"] for k in range(2)
+    ])
+    db.commit()
+    owner = (user.id, auth.create_access_token({"sub": user.email, "uid": user.id}))
+    db.close()
+    return owner
+
+
+def measure_stream(host: str, token: str, export_format: str) -> dict:
+    import httpx
+
+    received = lines = 0
+    tracemalloc.reset_peak()
+    floor = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    with httpx.stream("GET", f"http://{host}/api/wishlists/export", params={"format": export_format},
+                      headers={"Authorization": f"Bearer {token}"}, timeout=600) as response:
+        response.raise_for_status()
+        for chunk in response.iter_bytes():
+            received += len(chunk)
+            lines += chunk.count(b"\n")
+    elapsed = time.perf_counter() - started
+    return {
+        "peak_mb": round((tracemalloc.get_traced_memory()[1] - floor) / 2 ** 20, 2),
+        "mb_sent": round(received / 2 ** 20, 1),
+        "lines": lines,
+        "seconds": round(elapsed, 2),
+    }
+
+
+def measure_load_all(owner_id: int) -> dict:
+    tracemalloc.reset_peak()
+    floor = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        body = serializers.dumps(serializers.owner_wishlists(db, models.Wishlist.owner_id == owner_id))
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] - floor
+    return {"peak_mb": round(peak / 2 ** 20, 2), "mb_sent": round(len(body) / 2 ** 20, 1), "seconds": round(elapsed, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--items-per-list", type=int, default=500)
+    parser.add_argument("--skip-load-all", action="store_true")
+    args = parser.parse_args()
+
+    init_db()
+    results = []
+    with running_server() as host:
+        tracemalloc.start()
+        for size in sorted(args.sizes):
+            owner_id, token = seed(size, args.items_per_list)
+            for export_format in ("ndjson", "csv"):
+                results.append({"items": size, "variant": export_format,
+                                **measure_stream(host, token, export_format)})
+            if not args.skip_load_all:
+                results.append({"items": size, "variant": "load_all", **measure_load_all(owner_id)})
+        tracemalloc.stop()
+    print(json.dumps(results, indent=2))
+
+    streamed = [r for r in results if r["variant"] != "load_all"]
+    smallest = max(r["peak_mb"] for r in streamed if r["items"] == streamed[0]["items"])
+    largest = max(r["peak_mb"] for r in streamed if r["items"] == streamed[-1]["items"])
+    if largest > 2 * smallest + 1:
+        print(f"Export memory grows with the account: {smallest} MB -> {largest} MB", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Deterministic synthetic data for scale testing, bulk-loaded into DATABASE_URL.
+
+Generates users, wishlists, items, reservations and contributions with the
+skew production has: lists per user and items per list are heavy-tailed,
+a few --huge-lists hold --huge-list-items items each, and --hot-pools
+pooling items on those lists get --hot-contributions contributions each.
+The stored totals (is_reserved, total_contributed, contributors_count)
+agree with the generated reservations and contributions.
+
+Rows are written with COPY on PostgreSQL and with batched executemany on
+SQLite, straight into the models.py tables. Ids continue after the current
+maximum of each table, so the same --seed on an empty database always
+produces the same rows. Every user's password is --password.
+
+Run from the backend directory:
+
+    DATABASE_URL=sqlite:///./scale.db python -m benchmarks.generate_data --users 20000 --seed 1
+"""
+import argparse
+import base64
+import csv
+import io
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+from app import models
+from app.database import engine, init_db
+from app.hashing import pwd_context
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+TITLES = ["Книга", "Наушники", "LEGO", "Кофемашина", "Билеты в театр", "Рюкзак", "Настольная игра",
+          "Headphones", "Camera lens", "Bike", "Plant", "Perfume", "Board game", "Sneakers"]
+
+# Contributions are 100..MAX_CONTRIBUTION each; a hot pool is priced at the
+# maximum for each of its contributions, so all of them fit before it fills up
+MAX_CONTRIBUTION = 2000
+_PRICE = models.WishlistItem.__table__.c.price.type
+# Largest value the Numeric(precision, scale) price and total columns hold
+MAX_PRICE = Decimal(10) ** (_PRICE.precision - _PRICE.scale) - Decimal(1).scaleb(-_PRICE.scale)
+
+# Parents first, so every flush satisfies the foreign keys
+TABLES = [
+    (models.User.__table__, ["id", "email", "username", "hashed_password", "is_active", "created_at"]),
+    (models.Wishlist.__table__, ["id", "title", "description", "slug", "is_public", "owner_id", "created_at"]),
+    (models.WishlistItem.__table__, [
+        "id", "title", "description", "url", "price", "currency", "priority", "is_reserved", "is_pooling",
+        "total_contributed", "contributors_count", "wishlist_id", "created_at",
+    ]),
+    (models.Reservation.__table__, ["id", "item_id", "reserver_name", "reserver_email", "created_at"]),
+    (models.Contribution.__table__, ["id", "item_id", "contributor_name", "amount", "message", "created_at"]),
+]
+
+
+def sqlite_value(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        # The format CURRENT_TIMESTAMP server defaults produce
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def copy_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class BulkLoader:
+    """Buffers rows per table and writes all tables, parents first, every batch_size rows."""
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.dialect = engine.dialect.name
+        self.buffers = {table.name: [] for table, _ in TABLES}
+        self.counts = {table.name: 0 for table, _ in TABLES}
+        self.pending = 0
+        self.connection = engine.raw_connection()
+
+    def next_ids(self) -> dict:
+        with engine.connect() as conn:
+            return {
+                table.name: (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+                for table, _ in TABLES
+            }
+
+    def add(self, table: str, row: tuple):
+        self.buffers[table].append(row)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        cursor = self.connection.cursor()
+        try:
+            for table, columns in TABLES:
+                rows = self.buffers[table.name]
+                if not rows:
+                    continue
+                if self.dialect == "postgresql":
+                    self._copy(cursor, table.name, columns, rows)
+                else:
+                    cursor.executemany(
+                        f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                        [tuple(sqlite_value(value) for value in row) for row in rows],
+                    )
+                self.counts[table.name] += len(rows)
+                rows.clear()
+            self.connection.commit()
+        finally:
+            cursor.close()
+        self.pending = 0
+
+    def _copy(self, cursor, table: str, columns: list, rows: list):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([copy_value(value) for value in row])
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    def close(self):
+        self.flush()
+        if self.dialect == "postgresql":
+            # Ids were set explicitly; move the serial sequences past them
+            cursor = self.connection.cursor()
+            for table, _ in TABLES:
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"
+                )
+            self.connection.commit()
+            cursor.close()
+        self.connection.close()
+
+
+class Generator:
+    def __init__(self, args, loader: BulkLoader):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.loader = loader
+        self.ids = loader.next_ids()
+        self.slugs = set()
+        self.password_hash = pwd_context.hash(args.password, salt=self.bcrypt_salt())
+
+    def bcrypt_salt(self) -> str:
+        # From the seeded RNG, so hashed_password is the same on every run;
+        # the last of the 22 characters only carries 4 bits
+        alphabet = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+        return "".join(self.rng.choice(alphabet) for _ in range(21)) + self.rng.choice(".Oeu")
+
+    def take_id(self, table: str) -> int:
+        value = self.ids[table]
+        self.ids[table] = value + 1
+        return value
+
+    def moment(self, after: datetime, within_days: float) -> datetime:
+        return after + timedelta(seconds=int(self.rng.random() * within_days * 86400))
+
+    def slug(self) -> str:
+        while True:
+            slug = base64.urlsafe_b64encode(self.rng.getrandbits(64).to_bytes(8, "big")).decode().rstrip("=")
+            if slug not in self.slugs:
+                self.slugs.add(slug)
+                return slug
+
+    def lists_per_user(self) -> int:
+        return min(self.args.max_lists, int(self.rng.paretovariate(1.3)))
+
+    def items_per_list(self) -> int:
+        return min(self.args.max_list_items, int(self.rng.lognormvariate(math.log(self.args.median_items), 1.0)))
+
+    def run(self):
+        rng = self.rng
+        huge_left = self.args.huge_lists
+        hot_left = self.args.hot_pools
+        for _ in range(self.args.users):
+            user_id = self.take_id("users")
+            joined = self.moment(START, 365)
+            self.loader.add("users", (
+                user_id, f"user{user_id}@synthetic.example.com", f"synthetic{user_id}", self.password_hash, True, joined,
+            ))
+            for _ in range(self.lists_per_user()):
+                huge = huge_left > 0
+                huge_left -= huge
+                wishlist_id = self.take_id("wishlists")
+                created = self.moment(joined, 180)
+                self.loader.add("wishlists", (
+                    wishlist_id, f"{rng.choice(TITLES)} #{wishlist_id}", None if rng.random() < 0.6 else "Описание",
+                    self.slug(), rng.random() > 0.15, user_id, created,
+                ))
+                count = self.args.huge_list_items if huge else self.items_per_list()
+                for n in range(count):
+                    hot = huge and hot_left > 0 and n < self.args.hot_pools_per_list
+                    hot_left -= hot
+                    self.item(wishlist_id, created, hot)
+
+    def item(self, wishlist_id: int, listed: datetime, hot: bool):
+        rng = self.rng
+        item_id = self.take_id("wishlist_items")
+        created = self.moment(listed, 30)
+        pooling = hot or rng.random() < self.args.pooling_share
+        price = None if not pooling and rng.random() < 0.2 else Decimal(rng.randint(500, 5_000_000)) / 100
+        if hot:
+            price = Decimal(self.args.hot_contributions * MAX_CONTRIBUTION)
+
+        total = Decimal(0)
+        contributions = []
+        reserved = False
+        if pooling:
+            wanted = self.args.hot_contributions if hot else int(rng.expovariate(1 / self.args.avg_contributions))
+            for _ in range(wanted):
+                amount = min(Decimal(rng.randint(100, MAX_CONTRIBUTION)), price - total)
+                if amount <= 0:
+                    break
+                total += amount
+                contributions.append(amount)
+            reserved = total == price
+        elif rng.random() < self.args.reserved_share:
+            reserved = True
+
+        self.loader.add("wishlist_items", (
+            item_id, f"{rng.choice(TITLES)} {item_id}", None if rng.random() < 0.5 else "x" * rng.randint(10, 200),
+            f"https://shop.example.com/p/{item_id}" if rng.random() < 0.7 else None,
+            price, "RUB", rng.randint(0, 2), reserved, pooling, total, len(contributions), wishlist_id, created,
+        ))
+        if reserved and not pooling:
+            reservation_id = self.take_id("reservations")
+            self.loader.add("reservations", (
+                reservation_id, item_id, f"Friend {reservation_id}", f"friend{reservation_id}@synthetic.example.com",
+                self.moment(created, 30),
+            ))
+        for amount in contributions:
+            contribution_id = self.take_id("contributions")
+            self.loader.add("contributions", (
+                contribution_id, item_id, f"Friend {contribution_id}", amount,
+                None if rng.random() < 0.7 else "С днём рождения!", self.moment(created, 30),
+            ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--max-lists", type=int, default=40, help="per user")
+    parser.add_argument("--median-items", type=float, default=12, help="per ordinary list")
+    parser.add_argument("--max-list-items", type=int, default=2_000, help="per ordinary list")
+    parser.add_argument("--huge-lists", type=int, default=5)
+    parser.add_argument("--huge-list-items", type=int, default=20_000)
+    parser.add_argument("--hot-pools", type=int, default=10)
+    parser.add_argument("--hot-pools-per-list", type=int, default=2)
+    parser.add_argument("--hot-contributions", type=int, default=5_000)
+    parser.add_argument("--pooling-share", type=float, default=0.1)
+    parser.add_argument("--avg-contributions", type=float, default=3)
+    parser.add_argument("--reserved-share", type=float, default=0.25)
+    parser.add_argument("--password", default="synthetic")
+    parser.add_argument("--batch-size", type=int, default=20_000, help="rows buffered before a write")
+    args = parser.parse_args()
+    if args.hot_contributions * MAX_CONTRIBUTION > MAX_PRICE:
+        parser.error(f"--hot-contributions must be at most {int(MAX_PRICE // MAX_CONTRIBUTION)}: hot pools are "
+                     f"priced at {MAX_CONTRIBUTION} per contribution and prices are at most {MAX_PRICE}")
+
+    init_db()
+    loader = BulkLoader(args.batch_size)
+    started = time.perf_counter()
+    try:
+        Generator(args, loader).run()
+    finally:
+        loader.close()
+    elapsed = time.perf_counter() - started
+    rows = sum(loader.counts.values())
+    print(json.dumps({
+        "database": loader.dialect,
+        "seed": args.seed,
+        "rows": loader.counts,
+        "total_rows": rows,
+        "seconds": round(elapsed, 1),
+        "rows_per_s": round(rows / elapsed),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
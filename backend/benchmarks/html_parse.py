@@ -0,0 +1,98 @@
+"""CPU time and peak memory of metadata extraction per page: full body vs.
+streamed prefix, for every installed HTML parser backend.
+
+Run from the backend directory:
+
+    python -m benchmarks.html_parse --body-kb 3000 --repeat 5
+    python -m benchmarks.html_parse --file saved_page.html --url https://www.ozon.ru/product/1
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.routes.url_parser import HTML_HEAD_BUDGET, HTML_MAX_BYTES, extract_metadata  # noqa: E402
+
+HEAD = """<!DOCTYPE html><html><head><meta charset="utf-8">
+<title>Смартфон Example X 128 ГБ</title>
+<meta property="og:title" content="Смартфон Example X 128 ГБ">
+<meta property="og:description" content="Отличный смартфон">
+<meta property="og:image" content="https://cdn.example.com/x.jpg">
+<meta property="og:price:amount" content="29990">
+<meta property="og:price:currency" content="RUB">
+</head><body>"""
+
+BLOCK = """<div class="card"><a href="/p/{i}"><img src="/i/{i}.jpg" alt="item {i}"></a>
+<span class="card-price">{price} ₽</span><p>Описание товара номер {i}, доставка завтра.</p></div>
+"""
+
+
+def synthetic_page(body_kb: int) -> str:
+    blocks = []
+    size = 0
+    i = 0
+    while size < body_kb * 1024:
+        block = BLOCK.format(i=i, price=1000 + i)
+        blocks.append(block)
+        size += len(block.encode("utf-8"))
+        i += 1
+    return HEAD + "".join(blocks) + "</body></html>"
+
+
+def prefix_of(html: str) -> str:
+    # Same cut as HTTPClientPool.get_prefix
+    data = html.encode("utf-8")
+    head_end = data.find(b"</head>")
+    limit = HTML_MAX_BYTES if head_end == -1 else min(HTML_MAX_BYTES, head_end + 7 + HTML_HEAD_BUDGET)
+    return data[:limit].decode("utf-8", errors="replace")
+
+
+def measure(html: str, url: str, parser: str, repeat: int) -> dict:
+    cpu = []
+    for _ in range(repeat):
+        started = time.process_time()
+        result = asyncio.run(extract_metadata(html, url, parser))
+        cpu.append(time.process_time() - started)
+    # Separate run: tracemalloc itself slows parsing down several times
+    tracemalloc.start()
+    asyncio.run(extract_metadata(html, url, parser))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "parser": parser,
+        "bytes": len(html.encode("utf-8")),
+        "cpu_ms": round(min(cpu) * 1000, 1),
+        "peak_mb": round(peak / 2 ** 20, 1),
+        "price": result["price"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--file", help="saved HTML page instead of the synthetic one")
+    parser.add_argument("--url", default="https://shop.example.com/product/1")
+    parser.add_argument("--body-kb", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8", errors="replace") as f:
+            html = f.read()
+    else:
+        html = synthetic_page(args.body_kb)
+
+    parsers = ["html.parser"] + [p for p in ("lxml", "html5lib") if importlib.util.find_spec(p)]
+    results = []
+    for mode, page in (("full", html), ("prefix", prefix_of(html))):
+        for name in parsers:
+            results.append({"mode": mode, **measure(page, args.url, name, args.repeat)})
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Cross-worker broadcast check: two uvicorn processes on one SQLite file.
+
+Starts two separate worker processes with BROADCAST_BACKEND=socket (or
+--backend postgres with DATABASE_URL pointing at Postgres), then:
+
+1. reserves an item through worker A while a WebSocket viewer is
+   connected to worker B, and expects the event on B's socket;
+2. cancels the reservation through B with the viewer on A;
+3. checks that both workers' cached public views reflect each change;
+4. bulk-imports --bulk-items items through A with the viewer on B and
+   expects every new id in B's "items_added" events. With --backend
+   postgres this is what keeps the events under the NOTIFY size limit.
+
+Exits 1 on the first missing event or stale public view.
+
+Run from the backend directory:
+
+    python -m benchmarks.multi_worker_broadcast
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.server import free_port, use_temporary_sqlite
+
+
+def start_worker(port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env,
+    )
+
+
+def wait_healthy(base_url: str, process: subprocess.Popen, timeout: float = 30):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Worker at {base_url} exited with {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Worker at {base_url} did not start")
+
+
+async def expect_event(ws, item_id: int, kind: str, timeout: float) -> float:
+    started = time.perf_counter()
+    while True:
+        message = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+        if message.get("type") == kind and message.get("item_id") == item_id:
+            return time.perf_counter() - started
+
+
+async def expect_items(ws, item_ids: set, timeout: float) -> float:
+    started = time.perf_counter()
+    missing = set(item_ids)
+    while missing:
+        message = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+        if message.get("type") == "items_added":
+            missing.difference_update(message["data"]["item_ids"])
+    return time.perf_counter() - started
+
+
+async def is_reserved(client, base_url: str, slug: str, item_id: int) -> bool:
+    response = await client.get(f"{base_url}/api/wishlists/public/{slug}")
+    return next(item["is_reserved"] for item in response.json()["items"] if item["id"] == item_id)
+
+
+async def run(a: str, b: str, timeout: float, bulk_items: int) -> list:
+    import httpx
+    import websockets
+
+    failures = []
+    async with httpx.AsyncClient(timeout=30) as client:
+        response = await client.post(f"http://{a}/api/auth/register", json={
+            "email": "multiworker@example.com", "username": "multiworker", "password": "benchmark"
+        })
+        response.raise_for_status()
+        headers = {"Authorization": "Bearer " + response.json()["access_token"]}
+        wishlist = (await client.post(f"http://{a}/api/wishlists", json={"title": "shared", "is_public": True},
+                                      headers=headers)).json()
+        item = (await client.post(f"http://{a}/api/wishlists/{wishlist['id']}/items", json={"title": "gift"},
+                                  headers=headers)).json()
+        slug = wishlist["slug"]
+        # Fill both workers' public caches before any write
+        for host in (a, b):
+            await is_reserved(client, f"http://{host}", slug, item["id"])
+
+        steps = [
+            (a, b, "POST", "reservation", True),
+            (b, a, "DELETE", "reservation_cancelled", False),
+        ]
+        for writer, viewer, method, kind, reserved in steps:
+            async with websockets.connect(f"ws://{viewer}/api/items/ws/{wishlist['id']}") as ws:
+                body = {"reserver_email": "guest@example.com"}
+                if method == "POST":
+                    body["reserver_name"] = "guest"
+                response = await client.request(method, f"http://{writer}/api/items/{item['id']}/reserve", json=body)
+                if response.status_code >= 300:
+                    failures.append(f"{method} reserve on {writer}: {response.status_code} {response.text}")
+                    break
+                try:
+                    delay = await expect_event(ws, item["id"], kind, timeout)
+                    print(f"{kind}: written on {writer}, delivered on {viewer} in {delay * 1000:.1f} ms")
+                except asyncio.TimeoutError:
+                    failures.append(f"{kind} written on {writer} never reached the viewer on {viewer}")
+            for host in (a, b):
+                if await is_reserved(client, f"http://{host}", slug, item["id"]) != reserved:
+                    failures.append(f"public view on {host} is stale after {kind}")
+
+        async with websockets.connect(f"ws://{b}/api/items/ws/{wishlist['id']}") as ws:
+            rows = [{"title": f"bulk gift {n}"} for n in range(bulk_items)]
+            response = await client.post(f"http://{a}/api/wishlists/{wishlist['id']}/items/bulk", json=rows,
+                                          headers=headers)
+            if response.status_code != 201:
+                failures.append(f"bulk import on {a}: {response.status_code} {response.text[:200]}")
+                return failures
+            created = {created_item["id"] for created_item in response.json()["created"]}
+            try:
+                delay = await expect_items(ws, created, timeout)
+                print(f"items_added: {len(created)} ids written on {a}, delivered on {b} in {delay * 1000:.1f} ms")
+            except asyncio.TimeoutError:
+                failures.append(f"items_added for {len(created)} bulk items written on {a} "
+                                f"did not fully reach the viewer on {b}")
+        for host in (a, b):
+            response = await client.get(f"http://{host}/api/wishlists/public/{slug}")
+            if len(response.json()["items"]) != len(created) + 1:
+                failures.append(f"public view on {host} is stale after the bulk import")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["socket", "postgres"], default="socket")
+    parser.add_argument("--timeout", type=float, default=5, help="seconds to wait for each event")
+    parser.add_argument("--bulk-items", type=int, default=1000, help="rows in the bulk import, at most BULK_ITEMS_MAX")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["DATABASE_URL"] = use_temporary_sqlite()
+    env["BROADCAST_BACKEND"] = args.backend
+    env["BROADCAST_SOCKET_DIR"] = tempfile.mkdtemp(prefix="wishlist-broadcast-")
+    env.setdefault("BCRYPT_ROUNDS", "4")
+
+    hosts = [f"127.0.0.1:{free_port()}", f"127.0.0.1:{free_port()}"]
+    workers = []
+    try:
+        # One after the other, so only the first creates the tables
+        for host in hosts:
+            workers.append(start_worker(int(host.rsplit(":", 1)[1]), env))
+            wait_healthy(f"http://{host}", workers[-1])
+        failures = asyncio.run(run(*hosts, args.timeout, args.bulk_items))
+    finally:
+        for worker in workers:
+            worker.terminate()
+            worker.wait()
+
+    for failure in failures:
+        print("FAIL:", failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+    print("OK: events and invalidations crossed workers in both directions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""SQL statements per request for the owner and guest wishlist views.
+
+Seeds a small account (one list, two items) and a large one (--lists lists
+of --items items with pooling items, contributions and reservations),
+then counts the statements each view issues on both engines. The views
+must use a fixed number of queries, so the script exits 1 when any count
+differs between the two accounts.
+
+Run from the backend directory:
+
+    python -m benchmarks.query_counts --lists 30 --items 200
+"""
+import argparse
+import json
+import sys
+from decimal import Decimal
+
+from benchmarks.server import use_temporary_sqlite
+
+use_temporary_sqlite()
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event, insert  # noqa: E402
+
+from app import auth, models  # noqa: E402
+from app.database import SessionLocal, async_engine, engine, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+
+statements = 0
+
+
+def count_statement(*args):
+    global statements
+    statements += 1
+
+
+def seed(name: str, lists: int, items: int) -> dict:
+    db = SessionLocal()
+    user = models.User(email=f"{name}@example.com", username=name, hashed_password="x")
+    db.add(user)
+    db.commit()
+    wishlists = db.execute(insert(models.Wishlist).returning(models.Wishlist.id, models.Wishlist.slug), [
+        {"title": f"list {n}", "slug": models.Wishlist.generate_slug(), "owner_id": user.id}
+        for n in range(lists)
+    ]).all()
+    item_ids = db.scalars(insert(models.WishlistItem).returning(models.WishlistItem.id), [
+        {"wishlist_id": wishlist.id, "title": f"gift {n}", "price": Decimal(1000), "is_pooling": n % 2 == 0,
+         "is_reserved": n % 4 == 1, "total_contributed": Decimal(10) if n % 2 == 0 else Decimal(0),
+         "contributors_count": 1 if n % 2 == 0 else 0}
+        for wishlist in wishlists for n in range(items)
+    ]).all()
+    for n, item_id in enumerate(item_ids):
+        if n % 2 == 0:
+            db.add(models.Contribution(item_id=item_id, contributor_name="Bob", amount=Decimal(10)))
+        elif n % 4 == 1:
+            db.add(models.Reservation(item_id=item_id, reserver_name="Anna"))
+    db.commit()
+    token = auth.create_access_token({"sub": user.email, "uid": user.id})
+    db.close()
+    return {
+        "headers": {"Authorization": f"Bearer {token}"},
+        "wishlist_id": wishlists[0].id,
+        "slug": wishlists[0].slug,
+    }
+
+
+def count(client: TestClient, method: str, url: str, **kwargs) -> int:
+    global statements
+    statements = 0
+    response = client.request(method, url, **kwargs)
+    response.raise_for_status()
+    return statements
+
+
+def measure(client: TestClient, account: dict) -> dict:
+    headers = account["headers"]
+    wishlist_id = account["wishlist_id"]
+    # Warms the user cache so the auth dependency does not add a query to the first view
+    client.get("/api/auth/me", headers=headers)
+    return {
+        "owner_list": count(client, "GET", "/api/wishlists", headers=headers),
+        "owner_detail": count(client, "GET", f"/api/wishlists/{wishlist_id}", headers=headers),
+        "owner_update": count(client, "PUT", f"/api/wishlists/{wishlist_id}", headers=headers,
+                              json={"description": "updated"}),
+        "public": count(client, "GET", f"/api/wishlists/public/{account['slug']}"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lists", type=int, default=30)
+    parser.add_argument("--items", type=int, default=200, help="per list of the large account")
+    args = parser.parse_args()
+
+    init_db()
+    event.listen(engine, "before_cursor_execute", count_statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+    small = seed("small", 1, 2)
+    large = seed("large", args.lists, args.items)
+    with TestClient(app) as client:
+        result = {"small": measure(client, small), "large": measure(client, large)}
+    print(json.dumps(result, indent=2))
+
+    grown = [view for view, queries in result["large"].items() if queries != result["small"][view]]
+    if grown:
+        print(f"Query count depends on the account size for: {', '.join(grown)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Owner and guest wishlist responses: ORM + pydantic + json vs. app.serializers.
+
+"legacy" is how the responses were built before app.serializers: load the
+ORM graph, copy __dict__, validate with WishlistOwner/WishlistGuest, then
+jsonable_encoder and the stdlib encoder JSONResponse uses. Both paths must
+produce identical bytes; the script exits 1 if they differ.
+
+Run from the backend directory:
+
+    python -m benchmarks.serialization --items 1000
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+from benchmarks.server import use_temporary_sqlite
+
+use_temporary_sqlite()
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+
+from app import models, schemas, serializers  # noqa: E402
+from app.database import SessionLocal, init_db  # noqa: E402
+from app.routes.wishlists import calculate_total_contributed  # noqa: E402
+
+TITLES = ["Книга", "LEGO® set", 'Quote "this"', "multi\nline", "emoji 🎁", "tab\tand \\ slash", "plain"]
+
+
+def render(content) -> bytes:
+    # fastapi.responses.JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def legacy_owner(db, wishlist_id: int) -> bytes:
+    wishlist = db.query(models.Wishlist).options(
+        selectinload(models.Wishlist.items)
+    ).filter(models.Wishlist.id == wishlist_id).first()
+    wishlist_dict = wishlist.__dict__.copy()
+    wishlist_dict["items"] = []
+    for item in wishlist.items:
+        item_dict = item.__dict__.copy()
+        item_dict["total_contributed"] = calculate_total_contributed(item)
+        wishlist_dict["items"].append(item_dict)
+    return render(jsonable_encoder(schemas.WishlistOwner.parse_obj(wishlist_dict)))
+
+
+def legacy_guest(db, wishlist_id: int) -> bytes:
+    wishlist = db.query(models.Wishlist).options(
+        selectinload(models.Wishlist.items).selectinload(models.WishlistItem.reservations),
+        selectinload(models.Wishlist.items).selectinload(models.WishlistItem.contributions)
+    ).filter(models.Wishlist.id == wishlist_id).first()
+    wishlist_dict = wishlist.__dict__.copy()
+    wishlist_dict["items"] = []
+    for item in wishlist.items:
+        item_dict = item.__dict__.copy()
+        item_dict["total_contributed"] = calculate_total_contributed(item)
+        item_dict["reservations"] = item.reservations
+        item_dict["contributions"] = item.contributions
+        wishlist_dict["items"].append(item_dict)
+    return render(jsonable_encoder(schemas.WishlistGuest.parse_obj(wishlist_dict)))
+
+
+def fast_owner(db, wishlist_id: int) -> bytes:
+    return serializers.FastJSONResponse(
+        serializers.owner_wishlists(db, models.Wishlist.id == wishlist_id)[0]
+    ).body
+
+
+def fast_guest(db, wishlist_id: int) -> bytes:
+    return serializers.dumps(serializers.guest_wishlist(db, models.Wishlist.id == wishlist_id))
+
+
+def seed(items: int) -> int:
+    rng = random.Random(20)
+    db = SessionLocal()
+    user = models.User(email=f"ser{items}@example.com", username=f"ser{items}", hashed_password="x")
+    db.add(user)
+    db.commit()
+    wishlist = models.Wishlist(title="Дни рождения", description="with \"quotes\"", slug=models.Wishlist.generate_slug(),
+                               owner_id=user.id)
+    db.add(wishlist)
+    db.commit()
+    rows = []
+    for n in range(items):
+        pooling = n % 7 == 0
+        price = Decimal(rng.randint(100, 999999)) / 100 if n % 5 else None
+        rows.append({
+            "wishlist_id": wishlist.id, "title": f"{TITLES[n % len(TITLES)]} {n}",
+            "description": None if n % 3 else "x" * rng.randint(0, 300),
+            "url": f"https://shop.example.com/p/{n}?ref=ü" if n % 2 else None,
+            "image_url": f"https://img.example.com/{n}.jpg" if n % 4 else None,
+            "price": price if price or not pooling else Decimal("500.00"), "currency": "RUB" if n % 9 else "USD",
+            "priority": n % 3, "is_pooling": pooling, "is_reserved": not pooling and n % 4 == 1,
+        })
+    item_ids = db.scalars(insert(models.WishlistItem).returning(models.WishlistItem.id), rows).all()
+    for item_id, row in zip(item_ids, rows):
+        if row["is_reserved"]:
+            db.add(models.Reservation(item_id=item_id, reserver_name="Анна", reserver_email="anna@example.com"))
+        if row["is_pooling"] and item_id % 2:
+            db.add(models.Contribution(item_id=item_id, contributor_name="Bob", amount=Decimal("12.30"), message="🎉"))
+            db.query(models.WishlistItem).filter(models.WishlistItem.id == item_id).update(
+                {"total_contributed": Decimal("12.30"), "contributors_count": 1}
+            )
+    db.commit()
+    wishlist_id = wishlist.id
+    db.close()
+    return wishlist_id
+
+
+def timed(build, wishlist_id: int, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            body = build(db, wishlist_id)
+            timings.append(time.perf_counter() - started)
+        finally:
+            db.close()
+    return body, round(statistics.median(timings) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    init_db()
+    wishlist_id = seed(args.items)
+    results, mismatched = [], []
+    for view, legacy, fast in (("owner", legacy_owner, fast_owner), ("guest", legacy_guest, fast_guest)):
+        legacy_body, legacy_ms = timed(legacy, wishlist_id, args.repeat)
+        fast_body, fast_ms = timed(fast, wishlist_id, args.repeat)
+        if legacy_body != fast_body:
+            mismatched.append(view)
+        results.append({
+            "view": view,
+            "bytes": len(fast_body),
+            "identical": legacy_body == fast_body,
+            "legacy_ms": legacy_ms,
+            "serializers_ms": fast_ms,
+            "speedup": round(legacy_ms / fast_ms, 1),
+        })
+    print(json.dumps(results, indent=2))
+    if mismatched:
+        print(f"Output differs from the schemas for: {', '.join(mismatched)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Runs app.main:app under uvicorn in a background thread for benchmarks."""
+import contextlib
+import os
+import socket
+import tempfile
+import threading
+import time
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def use_temporary_sqlite():
+    """Point DATABASE_URL at a fresh SQLite file unless one is already set.
+
+    Must run before anything from `app` is imported.
+    """
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(prefix="wishlist-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return os.environ["DATABASE_URL"]
+
+
+@contextlib.contextmanager
+def running_server(port: int = 0):
+    import uvicorn
+    from app.main import app
+
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Server failed to start")
+        time.sleep(0.01)
+    try:
+        yield f"127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
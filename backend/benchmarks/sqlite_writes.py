@@ -0,0 +1,168 @@
+"""Concurrent write throughput on SQLite with and without the SQLite profile.
+
+Each mode runs in its own process against a fresh database file:
+
+    off         SQLITE_PROFILE=false (rollback journal, pysqlite defaults)
+    pragmas     WAL + pragmas, writers compete for the file lock
+    serialized  WAL + pragmas + in-process writer queue (the default)
+
+Writers loop over reserve / cancel / contribute (async handlers) and item
+updates (sync handler) while readers fetch the owner view of the list.
+
+Run from the backend directory:
+
+    python -m benchmarks.sqlite_writes --writers 32 --readers 8 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.server import running_server, use_temporary_sqlite
+
+MODES = {
+    "off": {"SQLITE_PROFILE": "false"},
+    "pragmas": {"SQLITE_PROFILE": "true", "SQLITE_SERIALIZE_WRITES": "false"},
+    "serialized": {"SQLITE_PROFILE": "true", "SQLITE_SERIALIZE_WRITES": "true"},
+}
+
+
+def percentile_ms(samples: list, p: float):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+
+async def setup(client, writers: int):
+    auth = await client.post("/api/auth/register", json={
+        "email": "bench@example.com", "username": "bench", "password": "benchmark"
+    })
+    headers = {"Authorization": "Bearer " + auth.json()["access_token"]}
+    wishlist = (await client.post("/api/wishlists", json={"title": "writes"}, headers=headers)).json()
+    url = f"/api/wishlists/{wishlist['id']}/items"
+    gifts = [(await client.post(url, json={"title": f"gift {i}"}, headers=headers)).json()["id"] for i in range(writers)]
+    # The pooling item lives on its own list so its growing contribution
+    # history does not inflate the reads
+    pool_list = (await client.post("/api/wishlists", json={"title": "pool"}, headers=headers)).json()
+    pool = (await client.post(f"/api/wishlists/{pool_list['id']}/items",
+                              json={"title": "pool", "price": 10 ** 7, "is_pooling": True}, headers=headers)).json()
+    return headers, wishlist["id"], pool["id"], gifts
+
+
+async def writer(client, n: int, headers: dict, pool_id: int, gift_id: int, stop: asyncio.Event, out: dict):
+    import httpx
+
+    email = f"writer{n}@example.com"
+    step = 0
+    while not stop.is_set():
+        kind = step % 4
+        step += 1
+        started = time.perf_counter()
+        try:
+            if kind == 0:
+                response = await client.post(f"/api/items/{gift_id}/reserve",
+                                             json={"reserver_name": "w", "reserver_email": email})
+            elif kind == 1:
+                response = await client.request("DELETE", f"/api/items/{gift_id}/reserve",
+                                                json={"reserver_email": email})
+            elif kind == 2:
+                response = await client.post(f"/api/items/{pool_id}/contribute",
+                                             json={"contributor_name": "w", "amount": 1})
+            else:
+                response = await client.put(f"/api/items/{gift_id}", json={"title": f"gift {n} v{step}"},
+                                            headers=headers)
+        except httpx.HTTPError:
+            out["failed"] += 1
+            continue
+        if response.status_code < 300:
+            out["latencies"].append(time.perf_counter() - started)
+        else:
+            out["failed"] += 1
+
+
+async def reader(client, headers: dict, wishlist_id: int, stop: asyncio.Event, out: dict):
+    import httpx
+
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"/api/wishlists/{wishlist_id}", headers=headers)
+        except httpx.HTTPError:
+            out["failed"] += 1
+            continue
+        if response.status_code == 200:
+            out["latencies"].append(time.perf_counter() - started)
+        else:
+            out["failed"] += 1
+
+
+async def run_mode(host: str, args) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.writers + args.readers + 4)
+    async with httpx.AsyncClient(base_url=f"http://{host}", limits=limits, timeout=60) as client:
+        headers, wishlist_id, pool_id, gifts = await setup(client, args.writers)
+        stop = asyncio.Event()
+        writes = {"latencies": [], "failed": 0}
+        reads = {"latencies": [], "failed": 0}
+        tasks = [
+            asyncio.create_task(writer(client, n, headers, pool_id, gifts[n], stop, writes))
+            for n in range(args.writers)
+        ] + [
+            asyncio.create_task(reader(client, headers, wishlist_id, stop, reads))
+            for _ in range(args.readers)
+        ]
+        await asyncio.sleep(args.seconds)
+        stop.set()
+        await asyncio.gather(*tasks)
+    return {
+        "writes_per_s": round(len(writes["latencies"]) / args.seconds, 1),
+        "failed_writes": writes["failed"],
+        "write_p50_ms": percentile_ms(writes["latencies"], 0.5),
+        "write_p99_ms": percentile_ms(writes["latencies"], 0.99),
+        "reads_per_s": round(len(reads["latencies"]) / args.seconds, 1),
+        "failed_reads": reads["failed"],
+        "read_p50_ms": percentile_ms(reads["latencies"], 0.5),
+        "read_p99_ms": percentile_ms(reads["latencies"], 0.99),
+    }
+
+
+def child(args):
+    use_temporary_sqlite()
+    with running_server() as host:
+        result = asyncio.run(run_mode(host, args))
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    results = []
+    for mode in args.modes:
+        env = {**os.environ, **MODES[mode]}
+        env.pop("DATABASE_URL", None)
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.sqlite_writes", "--child",
+             "--writers", str(args.writers), "--readers", str(args.readers), "--seconds", str(args.seconds)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        results.append({"mode": mode, **json.loads(output.strip().splitlines()[-1])})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Speed and accuracy of URL metadata extraction on the saved page corpus.
+
+Every page in benchmarks/fixtures/url_parser goes through fetch_metadata (the
+parse_url pipeline minus the cache) with the HTTP client served by an
+httpx.MockTransport, so no request leaves the machine. Reports per-page time,
+peak memory and title/price/currency accuracy against expected.json. An
+entry with a "file" key serves that saved page under another URL, e.g. the
+Amazon page on every store domain.
+
+Run from the backend directory:
+
+    python -m benchmarks.url_parser_corpus --save-baseline /tmp/url_parser.json
+    python -m benchmarks.url_parser_corpus --baseline /tmp/url_parser.json --max-regression 0.2
+
+With --baseline the exit status is 1 when throughput drops by more than
+--max-regression or accuracy drops at all. HTML_STREAMING=false measures
+full-body parsing.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import httpx  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+
+from app.http_client import HTTPClientPool  # noqa: E402
+from app.routes import url_parser  # noqa: E402
+
+FIXTURES = Path(__file__).parent / "fixtures" / "url_parser"
+FIELDS = ("title", "price", "currency")
+
+PRICE_SAMPLES = [
+    "24 999 ₽", "3 417 ₽", "Цена: 2 490 руб.", "$89.99", "€45,00",
+    "1.299,00 EUR", "129.90 USD", "18 490 ₽", "нет в наличии",
+]
+
+
+def load_corpus() -> dict:
+    with open(FIXTURES / "expected.json", encoding="utf-8") as f:
+        expected = json.load(f)
+    pages = {}
+    for name, fields in expected.items():
+        pages[fields["url"]] = (name, (FIXTURES / fields.get("file", name)).read_bytes(), fields)
+    return pages
+
+
+def mock_transport(pages: dict) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = pages.get(str(request.url))
+        if page is None:
+            return httpx.Response(404)
+        return httpx.Response(200, content=page[1], headers={"Content-Type": "text/html; charset=utf-8"})
+    return httpx.MockTransport(handler)
+
+
+async def fetch(url: str) -> dict:
+    try:
+        return await url_parser.fetch_metadata(url)
+    except HTTPException as e:
+        return {"error": f"{e.status_code} {e.detail}"}
+
+
+async def measure_page(url: str, fields: dict, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await fetch(url)
+        timings.append(time.perf_counter() - started)
+    # Separate run: tracemalloc itself slows parsing down several times
+    tracemalloc.start()
+    await fetch(url)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    correct = {field: result.get(field) == fields[field] for field in FIELDS}
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "min_ms": round(min(timings) * 1000, 2),
+        "peak_mb": round(peak / 2 ** 20, 2),
+        "correct": correct,
+        "got": {field: result.get(field) for field in FIELDS} if not all(correct.values()) else None,
+        "error": result.get("error"),
+    }
+
+
+async def measure_parse_price(repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for sample in PRICE_SAMPLES:
+            await url_parser.parse_price(sample)
+    return (time.perf_counter() - started) / (repeat * len(PRICE_SAMPLES))
+
+
+async def run(repeat: int) -> dict:
+    pages = load_corpus()
+    url_parser.http_client_pool = HTTPClientPool(transport=mock_transport(pages))
+    try:
+        per_page = {}
+        for url, (name, _, fields) in pages.items():
+            per_page[name] = await measure_page(url, fields, repeat)
+
+        # Throughput over the whole corpus, pages run back to back
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for url in pages:
+                await fetch(url)
+        elapsed = time.perf_counter() - started
+    finally:
+        await url_parser.http_client_pool.close()
+
+    checks = [ok for page in per_page.values() for ok in page["correct"].values()]
+    return {
+        "streaming": url_parser.HTML_STREAMING,
+        "pages": len(pages),
+        "pages_per_sec": round(len(pages) * repeat / elapsed, 1),
+        "accuracy": round(sum(checks) / len(checks), 4),
+        "field_accuracy": {
+            field: round(sum(page["correct"][field] for page in per_page.values()) / len(per_page), 4)
+            for field in FIELDS
+        },
+        "parse_price_us": round(await measure_parse_price(repeat * 100) * 1e6, 2),
+        "per_page": per_page,
+    }
+
+
+def compare(result: dict, baseline: dict, max_regression: float) -> list:
+    failures = []
+    floor = baseline["pages_per_sec"] * (1 - max_regression)
+    if result["pages_per_sec"] < floor:
+        failures.append(
+            f"throughput {result['pages_per_sec']} pages/s is below {floor:.1f} "
+            f"(baseline {baseline['pages_per_sec']}, max regression {max_regression:.0%})"
+        )
+    if result["accuracy"] < baseline["accuracy"]:
+        failures.append(f"accuracy {result['accuracy']} is below baseline {baseline['accuracy']}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--baseline", help="JSON written by --save-baseline to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed throughput drop, 0.2 = 20%%")
+    parser.add_argument("--save-baseline", help="write this run's results to the given path")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.repeat))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = compare(result, json.load(f), args.max_regression)
+        for failure in failures:
+            print("REGRESSION:", failure, file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Response size and latency of GET /api/wishlists as an account grows.
+
+"full" is the unpaginated listing with every item embedded; "page" is the
+first page of that shape; "summary" is the first page of the list-screen
+projection (title, slug, item_count, funded_percent).
+
+Run from the backend directory:
+
+    python -m benchmarks.wishlist_listing --lists 50 200 800 --items 20
+"""
+import argparse
+import json
+import statistics
+import time
+
+from benchmarks.server import use_temporary_sqlite
+
+use_temporary_sqlite()
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event, insert  # noqa: E402
+
+from app import auth, models  # noqa: E402
+from app.database import SessionLocal, engine, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+
+VARIANTS = {
+    "full": {},
+    "page": {"limit": 20},
+    "summary": {"limit": 20, "fields": "title,slug,item_count,funded_percent"},
+}
+
+statements = 0
+
+
+def count_statement(*args):
+    global statements
+    statements += 1
+
+
+def seed(lists: int, items: int) -> dict:
+    db = SessionLocal()
+    user = models.User(email=f"owner{lists}@example.com", username=f"owner{lists}", hashed_password="x")
+    db.add(user)
+    db.commit()
+    wishlist_ids = db.scalars(insert(models.Wishlist).returning(models.Wishlist.id), [
+        {"title": f"list {n}", "slug": models.Wishlist.generate_slug(), "owner_id": user.id}
+        for n in range(lists)
+    ]).all()
+    db.execute(insert(models.WishlistItem), [
+        {"wishlist_id": wishlist_id, "title": f"gift {n}", "description": "x" * 200,
+         "url": f"https://example.com/gift/{n}", "price": 100 + n, "is_reserved": n % 3 == 0}
+        for wishlist_id in wishlist_ids for n in range(items)
+    ])
+    db.commit()
+    token = auth.create_access_token({"sub": user.email, "uid": user.id})
+    db.close()
+    return {"Authorization": f"Bearer {token}"}
+
+
+def measure(client: TestClient, headers: dict, params: dict, repeat: int) -> dict:
+    global statements
+    timings = []
+    for _ in range(repeat):
+        statements = 0
+        started = time.perf_counter()
+        response = client.get("/api/wishlists", params=params, headers=headers)
+        timings.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return {
+        "bytes": len(response.content),
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "queries": statements,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lists", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    init_db()
+    event.listen(engine, "before_cursor_execute", count_statement)
+    results = []
+    with TestClient(app) as client:
+        for lists in args.lists:
+            headers = seed(lists, args.items)
+            for name, params in VARIANTS.items():
+                results.append({"lists": lists, "variant": name, **measure(client, headers, params, args.repeat)})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""WebSocket delivery latency while reservation/contribution writes run concurrently.
+
+Viewers watch list A. A probe reserves items of list A one by one and measures
+the time until every viewer received the event. Meanwhile N writers hammer a
+pooling item and reservable items of list B. With the async DB layer the probe
+latency should stay flat as N grows.
+
+Run from the backend directory:
+
+    python -m benchmarks.ws_latency_under_writes --viewers 200 --writers 0 8 32
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks.server import running_server, use_temporary_sqlite
+
+
+async def register(client) -> dict:
+    auth = await client.post("/api/auth/register", json={
+        "email": "bench@example.com", "username": "bench", "password": "benchmark"
+    })
+    return {"Authorization": "Bearer " + auth.json()["access_token"]}
+
+
+async def create_list(client, headers: dict, title: str, items: list):
+    wishlist = (await client.post("/api/wishlists", json={"title": title}, headers=headers)).json()
+    ids = []
+    for item in items:
+        created = await client.post(f"/api/wishlists/{wishlist['id']}/items", json=item, headers=headers)
+        ids.append(created.json()["id"])
+    return wishlist["id"], ids
+
+
+async def writer(client, pool_id: int, item_ids, stop: asyncio.Event, counters: dict):
+    import httpx
+
+    while not stop.is_set():
+        item_id = next(item_ids, None)
+        try:
+            if item_id is None:
+                response = await client.post(f"/api/items/{pool_id}/contribute",
+                                             json={"contributor_name": "load", "amount": 1})
+            else:
+                response = await client.post(f"/api/items/{item_id}/reserve", json={"reserver_name": "load"})
+        except httpx.HTTPError:
+            counters["failed"] += 1
+            continue
+        counters["ok" if response.status_code == 200 else "failed"] += 1
+
+
+async def probe_round(host, client, wishlist_id, probe_ids, viewers: int, writers: int, busy) -> dict:
+    import websockets
+
+    sockets = [await websockets.connect(f"ws://{host}/api/items/ws/{wishlist_id}") for _ in range(viewers)]
+    stop = asyncio.Event()
+    writes = {"ok": 0, "failed": 0}
+    pool_id, item_ids = busy
+    shared_items = iter(item_ids)
+    tasks = [asyncio.create_task(writer(client, pool_id, shared_items, stop, writes)) for _ in range(writers)]
+    await asyncio.sleep(0.5)
+
+    latencies = []
+    failed_probes = 0
+    started = time.perf_counter()
+    for item_id in probe_ids:
+        sent = time.perf_counter()
+        response = await client.post(f"/api/items/{item_id}/reserve", json={"reserver_name": "probe"})
+        if response.status_code != 200:
+            failed_probes += 1
+            continue
+        for ws in sockets:
+            while json.loads(await ws.recv()).get("item_id") != item_id:
+                pass
+        latencies.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await asyncio.gather(*tasks)
+    for ws in sockets:
+        await ws.close()
+
+    ordered = sorted(latencies)
+    return {
+        "writers": writers,
+        "viewers": viewers,
+        "writes_per_s": round(writes["ok"] / elapsed, 1),
+        "failed_writes": writes["failed"],
+        "failed_probes": failed_probes,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))] * 1000, 2),
+    }
+
+
+async def run(host: str, args) -> list:
+    import httpx
+
+    limits = httpx.Limits(max_connections=max(args.writers) + 4)
+    async with httpx.AsyncClient(base_url=f"http://{host}", limits=limits, timeout=60) as client:
+        headers = await register(client)
+        results = []
+        for writers in args.writers:
+            # Fresh lists per round, so every round reserves unreserved items
+            watched_id, probe_ids = await create_list(
+                client, headers, f"watched {writers}", [{"title": f"probe {i}"} for i in range(args.probes)]
+            )
+            _, busy_ids = await create_list(
+                client, headers, f"busy {writers}",
+                [{"title": "pool", "price": 10 ** 7, "is_pooling": True}] +
+                [{"title": f"gift {i}"} for i in range(args.write_items)]
+            )
+            results.append(await probe_round(
+                host, client, watched_id, probe_ids, args.viewers, writers, (busy_ids[0], busy_ids[1:])
+            ))
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--viewers", type=int, default=200)
+    parser.add_argument("--writers", type=int, nargs="+", default=[0, 8, 32])
+    parser.add_argument("--probes", type=int, default=50)
+    parser.add_argument("--write-items", type=int, default=500)
+    args = parser.parse_args()
+
+    use_temporary_sqlite()
+    with running_server() as host:
+        results = asyncio.run(run(host, args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()